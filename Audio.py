@@ -0,0 +1,178 @@
+# Sound for the piano keyboard
+#   every pitch is synthesized once and cached, key presses only mix cached samples into small output blocks
+#   the output is kept in a ring buffer that can be saved as a .wav file, so it can be tested without speakers
+
+import threading
+import time  # https://docs.python.org/3/library/time.html#time.perf_counter
+import wave  # https://docs.python.org/3/library/wave.html
+from collections import deque
+import numpy as np
+
+try:
+  import pygame  # only needed to play the sound through speakers
+except ImportError:
+  pygame = None
+
+SAMPLE_RATE = 44100
+BUFFER_SIZE = 512  # samples per output block (11.6 ms)
+RING_SECONDS = 10  # seconds of output kept in the ring buffer
+NOTE_SECONDS = 1.5  # length of the synthesized samples
+HARMONICS = np.array([1, 2, 3, 4, 5, 6])
+HARMONIC_LEVELS = 1 / HARMONICS**1.5  # brighter than a sine wave, softer than a square wave
+VOLUME = 0.25  # level of one note, leaves room for chords before clipping
+MIDI_PITCHES = range(128)  # every midi number a key press can have
+
+
+def synthesize(pitch_num):
+  """Returns the sample for a midi number as a float32 array: additive harmonics with a piano-like envelope"""
+  frequency = 440 * 2**((pitch_num - 69) / 12)
+  t = np.arange(int(NOTE_SECONDS * SAMPLE_RATE)) / SAMPLE_RATE
+  audible = HARMONICS * frequency < SAMPLE_RATE / 2  # skip harmonics that would alias
+  phases = 2 * np.pi * frequency * np.outer(HARMONICS[audible], t)
+  wave_form = HARMONIC_LEVELS[audible] @ np.sin(phases)
+  # short attack, exponential decay and a fade out at the end so the sample doesn't click
+  envelope = np.minimum(t / 0.005, 1) * np.exp(-3 * t)
+  envelope *= np.minimum((NOTE_SECONDS - t) / 0.05, 1)
+  peak = HARMONIC_LEVELS[audible].sum()
+  return (VOLUME * wave_form * envelope / peak).astype(np.float32)
+
+
+class AudioEngine():
+  """Mixes the cached samples of the pressed keys into fixed-size output blocks"""
+
+  def __init__(self):
+    self.samples = {}  # midi number -> synthesized sample
+    # (sample, press time) added by note_on, safe to use from another thread
+    # bounded so presses don't pile up when no blocks are being rendered (no audio device)
+    self.new_voices = deque(maxlen=128)
+    self.voices = []  # [sample, position] for the notes that are still sounding
+    ring_blocks = int(RING_SECONDS * SAMPLE_RATE / BUFFER_SIZE)
+    self.ring = np.zeros(ring_blocks * BUFFER_SIZE, dtype=np.float32)
+    self.ring_position = 0
+    self.ring_filled = False
+    self.latencies = deque(maxlen=1000)  # seconds from note_on to the first sample being in the output
+    self.running = False
+    self.output_thread = None  # the thread started by start_output()
+
+  def preload(self, pitches):
+    """Synthesizes the samples for the given midi numbers ahead of time"""
+    for pitch_num in pitches:
+      self.get_sample(pitch_num)
+
+  def preload_in_background(self, pitches):
+    """Synthesizes the samples on a background thread, the pitches that are needed first should come first"""
+    thread = threading.Thread(target=self.preload,
+                              args=(list(pitches), ),
+                              daemon=True)
+    thread.start()
+    return thread
+
+  def get_sample(self, pitch_num):
+    """Returns the cached sample for a midi number, synthesizing it the first time"""
+    if pitch_num not in self.samples:
+      self.samples[pitch_num] = synthesize(pitch_num)
+    return self.samples[pitch_num]
+
+  def note_on(self, pitch_num):
+    """Starts playing a note, it is heard from the next output block"""
+    self.new_voices.append((self.get_sample(pitch_num), time.perf_counter()))
+
+  def render_block(self):
+    """Mixes one block of BUFFER_SIZE samples, adds it to the ring buffer and returns it"""
+    block = np.zeros(BUFFER_SIZE, dtype=np.float32)
+    press_times = []
+    while (len(self.new_voices) > 0):
+      sample, press_time = self.new_voices.popleft()
+      self.voices.append([sample, 0])
+      press_times.append(press_time)
+    for voice in self.voices:
+      sample, position = voice
+      chunk = sample[position:position + BUFFER_SIZE]
+      block[:len(chunk)] += chunk
+      voice[1] += BUFFER_SIZE
+    self.voices = [voice for voice in self.voices if voice[1] < len(voice[0])]
+    np.clip(block, -1, 1, out=block)
+
+    self.ring[self.ring_position:self.ring_position + BUFFER_SIZE] = block
+    self.ring_position += BUFFER_SIZE
+    if (self.ring_position == len(self.ring)):
+      self.ring_position = 0
+      self.ring_filled = True
+
+    done_time = time.perf_counter()
+    for press_time in press_times:
+      self.latencies.append(done_time - press_time)
+    return block
+
+  def recording(self):
+    """Returns the contents of the ring buffer from oldest to newest"""
+    if (self.ring_filled):
+      return np.concatenate(
+        (self.ring[self.ring_position:], self.ring[:self.ring_position]))
+    return self.ring[:self.ring_position].copy()
+
+  def write_wav(self, file_name):
+    """Saves the ring buffer as a 16-bit mono .wav file"""
+    pcm = (self.recording() * 32767).astype("<i2")
+    with wave.open(file_name, "wb") as wav_file:
+      wav_file.setnchannels(1)
+      wav_file.setsampwidth(2)
+      wav_file.setframerate(SAMPLE_RATE)
+      wav_file.writeframes(pcm.tobytes())
+
+  def start_output(self):
+    """Plays the output blocks through pygame's mixer on a background thread
+      returns False (and stays silent) if pygame or an audio device isn't available"""
+    if (pygame is None):
+      return False
+    try:
+      pygame.mixer.init(SAMPLE_RATE, -16, 1, BUFFER_SIZE)
+    except pygame.error:
+      return False
+    self.running = True
+    self.output_thread = threading.Thread(target=self.output_loop, daemon=True)
+    self.output_thread.start()
+    return True
+
+  def stop_output(self):
+    """Stops the background thread started by start_output()"""
+    self.running = False
+
+  def output_loop(self):
+    """Keeps one block playing and the next block queued on a mixer channel"""
+    channels = pygame.mixer.get_init()[2]
+    channel = pygame.mixer.Channel(0)
+    period = BUFFER_SIZE / SAMPLE_RATE
+    while (self.running):
+      if (channel.get_queue() is None):
+        block = (self.render_block() * 32767).astype(np.int16)
+        if (channels > 1):
+          block = np.repeat(block[:, None], channels, axis=1)  # a mono mixer only takes 1-dimensional arrays
+        sound = pygame.sndarray.make_sound(block)
+        if (channel.get_busy()):
+          channel.queue(sound)
+        else:
+          channel.play(sound)
+      time.sleep(period / 4)
+
+
+if __name__ == "__main__":
+  # hold 10 keys at once while blocks are rendered in real time, then report the latency and save the output
+  engine = AudioEngine()
+  engine.preload(range(60, 70))
+  period = BUFFER_SIZE / SAMPLE_RATE
+  next_block = time.perf_counter()
+  for block_num in range(int(2 / period)):
+    if (block_num % 20 == 0):
+      time.sleep(np.random.uniform(0, period))  # press at a random point between two blocks
+      for pitch_num in range(60, 70):
+        engine.note_on(pitch_num)
+    next_block += period
+    time.sleep(max(0, next_block - time.perf_counter()))
+    engine.render_block()
+  latencies = np.array(engine.latencies) * 1000
+  print("buffer period: %.2f ms" % (period * 1000))
+  print("press to first sample: median %.2f ms, max %.2f ms (%d presses)" %
+        (np.median(latencies), latencies.max(), len(latencies)))
+  engine.write_wav("audio_test.wav")
+  print("saved audio_test.wav")
@@ -0,0 +1,75 @@
+# Frame time benchmark for synthetic songs, runs without a display
+#   python3 Benchmark.py
+
+import random
+import time  # https://docs.python.org/3/library/time.html#time.perf_counter
+import numpy as np
+import Latency
+import ReadMidi
+import Render
+import TimeMap
+import main
+
+SONG_SIZES = (100, 1000, 10000)  # number of notes in each synthetic song
+FRAMES = 600  # frames measured per song (10 seconds of playback at 60 fps)
+NOTE_LENGTHS = (0.5, 1, 1, 1, 2, 4)  # beats, quarter notes are the most common
+
+
+def synthetic_song(note_count, seed=0):
+  """Returns (notes_data, tempo_map, meter_map) for a random melody in the same format as ReadMidi.readMidi()"""
+  rng = random.Random(seed)
+  notes_data = []
+  absolute_time = 0
+  for _ in range(note_count):
+    pitch_num = rng.randint(55, 84)
+    note_length = rng.choice(NOTE_LENGTHS)
+    start_time = absolute_time
+    absolute_time += note_length
+    notes_data.append((pitch_num, ReadMidi.get_pitch(pitch_num),
+                       note_length, absolute_time, start_time))
+  return (notes_data, TimeMap.TempoMap([0], [120]),
+          TimeMap.MeterMap([0], [(4, 4)]))
+
+
+def play_current_note(song):
+  """Plays the current note once it has stopped, like a player who always presses the right key"""
+  index = song.notes.current_note(main.LEFT_EDGE)
+  if (index is not None and song.notes.x(index) <= main.STOP_X + 1):
+    song.keyboard.check_correct(int(song.notes.rows["pitch"][index]))
+
+
+def benchmark_song(note_count, frames=FRAMES):
+  """Plays a synthetic song on a RecordingRenderer and returns the time of each frame in seconds
+    the latency of the presses is kept in main.latency"""
+  renderer = Render.RecordingRenderer()
+  main.use_renderer(renderer)
+  main.latency = Latency.LatencyMonitor()
+  selected_song = ["Synthetic_" + str(note_count) + ".mid", [4, 4], 0,
+                   "0 sharps", 0]
+  song = main.Song(selected_song, song_data=synthetic_song(note_count))
+  song.play()
+  frame_times = []
+  while (len(frame_times) < frames and song.playing):
+    play_current_note(song)
+    start = time.perf_counter()
+    renderer.run_next_timer()
+    frame_times.append(time.perf_counter() - start)
+  song.clear()
+  return frame_times
+
+
+def report(note_count, frame_times):
+  """Returns one line of the results table"""
+  ms = np.array(frame_times) * 1000
+  p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+  shown_ms = main.latency.latencies()[1]  # press until the next frame is on the window
+  return "%8d %8d %10.0f %8.3f %8.3f %8.3f %8.3f %10.2f" % (
+    note_count, len(ms), 1000 / ms.mean(), p50, p95, p99, ms.max(),
+    np.median(shown_ms))
+
+
+if __name__ == "__main__":
+  print(
+    "   notes   frames  frames/sec   p50 ms   p95 ms   p99 ms   max ms  shown ms")
+  for note_count in SONG_SIZES:
+    print(report(note_count, benchmark_song(note_count)))
@@ -0,0 +1,110 @@
+# Song catalog stored in SQLite, so the song list can be searched and read one page at a time
+#   the catalog is filled from MidiFiles.csv and only read again when the csv file changes
+
+import csv  # https://docs.python.org/3/library/csv.html
+import os
+import sqlite3  # https://docs.python.org/3/library/sqlite3.html
+
+CATALOG_FILE = "songs.db"
+SCHEMA_VERSION = 1  # increase when the tables change, older catalogs are filled again from the csv file
+
+
+def read_csv(file_name):
+  """get song data from csv file
+    returns a list of lists
+    each element: [str file_name, list time_signature, int pickup, str key_signature, int song_number]"""
+  song_list = []
+  with open(file_name, newline="") as file_obj:
+    reader = csv.reader(file_obj, skipinitialspace=True)
+    next(reader)  # skip the header
+    for song_num, contents in enumerate(reader, 1):
+      if (len(contents) < 4):
+        continue  # blank line
+      file_name, time_signature, pickup, key_signature = contents[:4]
+      time_signature = [int(num) for num in time_signature.split("/")
+                        ]  # ex. turns "4/4" into [4,4]
+      song_list.append(
+        [file_name, time_signature,
+         int(pickup), key_signature, song_num])
+  return song_list
+
+
+def get_title(file_name):
+  """Returns the song name shown to the user, ex. "Twinkle_Twinkle.mid" -> "Twinkle Twinkle" """
+  return " ".join(os.path.splitext(os.path.basename(file_name))[0].split("_"))
+
+
+class Catalog():
+  """Songs in an SQLite database, searchable by title"""
+
+  def __init__(self, db_file=CATALOG_FILE):
+    self.connection = sqlite3.connect(db_file)
+    if (self.connection.execute("PRAGMA user_version").fetchone()[0] !=
+        SCHEMA_VERSION):
+      self.connection.executescript("""
+        DROP TABLE IF EXISTS songs;
+        DROP TABLE IF EXISTS sources;
+        PRAGMA user_version = %d;
+      """ % SCHEMA_VERSION)
+    # a file can be listed more than once, like read_csv() allows
+    self.connection.executescript("""
+      CREATE TABLE IF NOT EXISTS songs (
+        song_number INTEGER PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        title TEXT NOT NULL COLLATE NOCASE,
+        time_signature TEXT NOT NULL,
+        pickup INTEGER NOT NULL,
+        key_signature TEXT NOT NULL
+      );
+      CREATE INDEX IF NOT EXISTS songs_title ON songs (title);
+      CREATE TABLE IF NOT EXISTS sources (file_name TEXT PRIMARY KEY, modified REAL);
+    """)
+
+  def import_csv(self, csv_file):
+    """Replaces the songs with the ones in a csv file, skipped if the file hasn't changed since the last import"""
+    modified = os.path.getmtime(csv_file)
+    row = self.connection.execute(
+      "SELECT modified FROM sources WHERE file_name = ?",
+      (csv_file, )).fetchone()
+    if (row is not None and row[0] == modified):
+      return
+    songs = [(song[4], song[0], get_title(song[0]),
+              "/".join(str(num) for num in song[1]), song[2], song[3])
+             for song in read_csv(csv_file)]
+    with self.connection:  # one transaction
+      self.connection.execute("DELETE FROM songs")
+      self.connection.executemany("INSERT INTO songs VALUES (?, ?, ?, ?, ?, ?)",
+                                  songs)
+      self.connection.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)",
+                              (csv_file, modified))
+
+  def search(self, text="", offset=0, limit=50):
+    """Returns up to limit songs with text in the title, starting at offset
+      titles that start with text come first, then the other matches, both in song number order
+      every song has the same format as read_csv()"""
+    if (text == ""):
+      # every song in order, read straight from the primary key
+      rows = self.connection.execute(
+        """SELECT file_name, time_signature, pickup, key_signature, song_number FROM songs
+           ORDER BY song_number LIMIT ? OFFSET ?""", (limit, offset))
+      return [self.to_song(row) for row in rows]
+    pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    rows = self.connection.execute(
+      """SELECT file_name, time_signature, pickup, key_signature, song_number FROM songs
+         WHERE title LIKE ? ESCAPE '\\'
+         ORDER BY title NOT LIKE ? ESCAPE '\\', song_number
+         LIMIT ? OFFSET ?""",
+      ("%" + pattern + "%", pattern + "%", limit, offset))
+    return [self.to_song(row) for row in rows]
+
+  def to_song(self, row):
+    """Converts a row of the songs table to the format of read_csv()"""
+    file_name, time_signature, pickup, key_signature, song_number = row
+    return [
+      file_name, [int(num) for num in time_signature.split("/")], pickup,
+      key_signature, song_number
+    ]
+
+  def close(self):
+    """Closes the database"""
+    self.connection.close()
@@ -0,0 +1,136 @@
+# Adds a directory of midi files to the song list
+#   every file is analysed on a process pool: time signature, tempo, pickup and key signature are read from the
+#   notes and meta messages (the key is detected from the notes if the file doesn't have a key signature),
+#   the parsed notes are saved in the song cache, and MidiFiles.csv and the catalog are rewritten with the new songs
+#   the tempo is only saved in the song cache, as the tempo map the song scrolls with: the song list has no tempo
+#     python3 Ingest.py DIRECTORY
+
+import argparse  # https://docs.python.org/3/library/argparse.html
+import os
+import time  # https://docs.python.org/3/library/time.html#time.perf_counter
+from concurrent.futures import ProcessPoolExecutor  # https://docs.python.org/3/library/concurrent.futures.html
+from mido import MidiFile
+import Catalog
+import KeyDetection
+import ReadMidi
+import SongCache
+
+CSV_FILE = "MidiFiles.csv"
+CSV_HEADER = "SONG FILE, TIME SIGNATURE, PICKUP, KEY SIGNATURE"
+CHUNK_SIZE = 16  # files sent to a worker process at a time
+
+
+def find_midi_files(directory):
+  """Returns the paths of the .mid files in a directory and its subdirectories, sorted"""
+  midi_files = []
+  for folder, _, file_names in os.walk(directory):
+    for file_name in file_names:
+      if (file_name.lower().endswith((".mid", ".midi"))):
+        midi_files.append(os.path.relpath(os.path.join(folder, file_name)))
+  return sorted(midi_files)
+
+
+def get_pickup(notes_data, time_signature):
+  """Returns the number of beats before the first barline, 0 if the song starts on the first beat of a measure
+    uses the silence before the first note: a song that starts on beat 3 of 4 has a pickup of 2 beats
+    a rest at the start of the song looks the same, so a song that starts with a rest gets a pickup it doesn't have"""
+  if (len(notes_data) == 0):
+    return 0
+  first_start = min(note[4] for note in notes_data)  # in quarter notes
+  beats = first_start * time_signature[1] / 4
+  beats_per_measure = time_signature[0]
+  return int(round(beats_per_measure - beats % beats_per_measure)) % beats_per_measure
+
+
+def analyse(file_name):
+  """Returns [file_name, time_signature, pickup, key_signature] for a midi file and saves its notes and tempo map
+    in the song cache
+    returns the error message instead if the file can't be read or has no notes. Runs on the worker processes"""
+  try:
+    mid = MidiFile(file_name, clip=True)
+    tempo_map, meter_map, notes_data = ReadMidi.extract_events(mid)
+    if (len(notes_data) == 0):
+      return file_name + ": no notes"  # nothing to play, the song couldn't be opened
+    time_signature = meter_map.signature_at(0)  # the song list has the time signature the song starts with
+    # the key signature in the file, or the key that fits the notes best if there isn't one
+    key_signature = (ReadMidi.get_key_signature(mid) or
+                     KeyDetection.detect_key_signature(notes_data))
+    SongCache.save_entry(SongCache.get_cache_path(file_name),
+                         notes_data,
+                         tempo_map,
+                         meter_map,
+                         evict_entries=False)
+  except Exception as error:  # mido raises many kinds of errors for broken files
+    return file_name + ": " + str(error)
+  return [
+    file_name,
+    list(time_signature),
+    get_pickup(notes_data, time_signature), key_signature
+  ]
+
+
+def format_csv_line(song):
+  """Returns the line of MidiFiles.csv for a song, in the same format as the existing lines"""
+  file_name = song[0]
+  if ("," in file_name or '"' in file_name):
+    file_name = '"' + file_name.replace('"', '""') + '"'
+  return ", ".join([
+    file_name, "/".join(str(num) for num in song[1]),
+    str(song[2]), song[3]
+  ])
+
+
+def write_csv(csv_file, songs):
+  """Adds the songs to the csv file, songs that are already in it are updated in place"""
+  song_list = Catalog.read_csv(csv_file) if os.path.exists(csv_file) else []
+  positions = {song[0]: index for index, song in enumerate(song_list)}
+  for song in songs:
+    if (song[0] in positions):
+      song_list[positions[song[0]]] = song
+    else:
+      positions[song[0]] = len(song_list)
+      song_list.append(song)
+  temp_file = csv_file + ".tmp"
+  with open(temp_file, "w") as file_obj:
+    file_obj.write(CSV_HEADER + "\n")
+    for song in song_list:
+      file_obj.write(format_csv_line(song) + "\n")
+  os.replace(temp_file, csv_file)
+
+
+def ingest(directory, csv_file=CSV_FILE, db_file=Catalog.CATALOG_FILE,
+           workers=None):
+  """Analyses every midi file in a directory and adds them to the csv file and the catalog
+    returns (songs added, error messages)"""
+  midi_files = find_midi_files(directory)
+  with ProcessPoolExecutor(workers) as executor:
+    results = list(executor.map(analyse, midi_files, chunksize=CHUNK_SIZE))
+  songs = [result for result in results if isinstance(result, list)]
+  errors = [result for result in results if isinstance(result, str)]
+  if (os.path.isdir(SongCache.CACHE_DIR)):
+    SongCache.evict(SongCache.MAX_CACHE_BYTES)
+  write_csv(csv_file, songs)
+  catalog = Catalog.Catalog(db_file)
+  catalog.import_csv(csv_file)
+  catalog.close()
+  return songs, errors
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description="Add a directory of midi files to the song list")
+  parser.add_argument("directory", help="directory with .mid files")
+  parser.add_argument("--csv", default=CSV_FILE, help="song list to update")
+  parser.add_argument("--db",
+                      default=Catalog.CATALOG_FILE,
+                      help="catalog to update")
+  parser.add_argument("--workers",
+                      type=int,
+                      help="number of processes (default: one per cpu)")
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  songs, errors = ingest(args.directory, args.csv, args.db, args.workers)
+  for error in errors:
+    print("skipped " + error)
+  print("added %d songs in %.2f s" % (len(songs), time.perf_counter() - start))
@@ -0,0 +1,52 @@
+# Finds the key of a song from its notes (Krumhansl-Schmuckler key finding)
+#   the time spent on each pitch class is compared with how well each pitch class fits every major and minor key
+#   resource: https://rnhart.net/articles/key-finding/
+
+import numpy as np
+
+# how well each pitch class fits a key with its tonic on C (Krumhansl and Kessler, 1982)
+MAJOR_PROFILE = np.array(
+  [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array(
+  [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+
+def standardize(values):
+  """Returns the rows of values with a mean of 0 and a standard deviation of 1"""
+  values = values - values.mean(axis=-1, keepdims=True)
+  return values / values.std(axis=-1, keepdims=True)
+
+
+# one row for every key: rows 0-11 are the major keys on C to B, rows 12-23 the minor keys
+KEY_PROFILES = standardize(
+  np.array([np.roll(profile, tonic)
+            for profile in (MAJOR_PROFILE, MINOR_PROFILE)
+            for tonic in range(12)]))
+
+
+def pitch_class_histogram(notes_data):
+  """Returns the number of beats spent on each pitch class (C, C#, ... B)"""
+  pitches = np.array([note[0] for note in notes_data], dtype=int)
+  lengths = np.array([note[2] for note in notes_data], dtype=float)
+  return np.bincount(pitches % 12, weights=lengths, minlength=12)
+
+
+def detect_key(notes_data):
+  """Returns (tonic pitch class, "major" or "minor") of the key that fits the notes best, C major if there are no notes"""
+  histogram = pitch_class_histogram(notes_data)
+  if (histogram.std() == 0):
+    return (0, "major")
+  correlations = KEY_PROFILES @ standardize(histogram) / 12
+  best = int(np.argmax(correlations))
+  return (best % 12, "major" if best < 12 else "minor")
+
+
+def detect_key_signature(notes_data):
+  """Returns the key signature of the detected key, ex. "2 sharps" for D major or B minor, "3 flats" for C minor"""
+  tonic, mode = detect_key(notes_data)
+  if (mode == "minor"):
+    tonic = (tonic + 3) % 12  # the major key with the same key signature
+  sharps = (tonic * 7) % 12  # each sharp moves the tonic up a fifth (7 half-steps)
+  if (sharps > 6):
+    return str(12 - sharps) + " flats"
+  return str(sharps) + " sharps"
@@ -0,0 +1,99 @@
+# Measures how long a key press takes to show up on the window
+#   every press that plays a note is timed at three stages: the input event is handled, the note is marked as
+#   played, and the next frame with the new color is sent to the window with update()
+
+import csv
+import json
+import numpy as np
+
+CAPACITY = 1000  # number of presses kept, older presses are overwritten
+HISTOGRAM_EDGES = (0, 1, 2, 4, 8, 16, 33, 50, 100, 250, np.inf)  # milliseconds
+STAGES = ("input", "played", "shown")
+
+
+class LatencyMonitor():
+  """Keeps the timestamps of the last CAPACITY presses in a ring buffer"""
+
+  def __init__(self, capacity=CAPACITY):
+    self.times = np.zeros((capacity, len(STAGES)))  # one row of timestamps in seconds per press
+    self.position = 0  # next row to write
+    self.count = 0  # number of rows in use
+    self.waiting = []  # (input time, played time) of the presses that haven't been shown yet
+
+  def note_played(self, input_time, played_time):
+    """Records a press that played a note, it is shown by the next frame drawn after it"""
+    self.waiting.append((input_time, played_time))
+
+  def frame_drawn(self):
+    """Called once a frame is drawn and before it is sent to the window, returns the presses it shows
+      presses handled while the frame is sent (the window handles input in update()) wait for the next frame"""
+    presses = self.waiting
+    self.waiting = []
+    return presses
+
+  def frame_shown(self, shown_time, presses):
+    """Called after a frame is sent to the window, finishes the presses returned by frame_drawn()"""
+    for input_time, played_time in presses:
+      self.times[self.position] = (input_time, played_time, shown_time)
+      self.position = (self.position + 1) % len(self.times)
+      self.count = min(self.count + 1, len(self.times))
+
+  def samples(self):
+    """Returns the timestamps of the recorded presses from oldest to newest"""
+    if (self.count < len(self.times)):
+      return self.times[:self.count]
+    return np.roll(self.times, -self.position, axis=0)
+
+  def latencies(self):
+    """Returns (input to played, input to shown) in milliseconds for every recorded press"""
+    times = self.samples()
+    return ((times[:, 1] - times[:, 0]) * 1000,
+            (times[:, 2] - times[:, 0]) * 1000)
+
+  def histogram(self):
+    """Returns the number of presses in each bin of HISTOGRAM_EDGES, measured from input to shown"""
+    return np.histogram(self.latencies()[1], HISTOGRAM_EDGES)[0]
+
+  def summary(self):
+    """Returns a dictionary with the median, 95th percentile and maximum of both latencies"""
+    summary = {"presses": self.count}
+    if (self.count == 0):
+      return summary
+    for name, values in zip(("played", "shown"), self.latencies()):
+      p50, p95 = np.percentile(values, [50, 95])
+      summary[name] = {"p50_ms": p50, "p95_ms": p95, "max_ms": values.max()}
+    return summary
+
+  def overlay_text(self):
+    """Returns one line to show on the window"""
+    if (self.count == 0):
+      return "latency: no presses yet"
+    summary = self.summary()
+    return "latency p50/p95: played %.1f/%.1f ms, shown %.1f/%.1f ms" % (
+      summary["played"]["p50_ms"], summary["played"]["p95_ms"],
+      summary["shown"]["p50_ms"], summary["shown"]["p95_ms"])
+
+  def write_json(self, file_name):
+    """Saves the summary, the histogram and every press as a .json file"""
+    played, shown = self.latencies()
+    data = {
+      "summary": self.summary(),
+      "histogram": {
+        "edges_ms": [float(edge) for edge in HISTOGRAM_EDGES[:-1]],
+        "counts": self.histogram().tolist()
+      },
+      "presses": [{
+        "played_ms": played_ms,
+        "shown_ms": shown_ms
+      } for played_ms, shown_ms in zip(played.tolist(), shown.tolist())]
+    }
+    with open(file_name, "w") as file_obj:
+      json.dump(data, file_obj, indent=2)
+
+  def write_csv(self, file_name):
+    """Saves one row per press as a .csv file"""
+    played, shown = self.latencies()
+    with open(file_name, "w", newline="") as file_obj:
+      writer = csv.writer(file_obj)
+      writer.writerow(["played_ms", "shown_ms"])
+      writer.writerows(zip(played.tolist(), shown.tolist()))
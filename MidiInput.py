@@ -0,0 +1,71 @@
+# Note presses from a midi keyboard, or from a .mid file played back in real time as a stand-in for one
+#   messages are read on a background thread and queued, the song takes them out of the queue once per frame
+
+import queue
+import threading
+import time  # https://docs.python.org/3/library/time.html#time.perf_counter
+import mido  # https://mido.readthedocs.io/en/latest/ports.html
+
+QUEUE_SIZE = 1024  # presses waiting for the next frame, the reading thread waits if the queue is full
+
+
+class MidiInput():
+  """Reads note presses on a background thread and hands them to the render loop in order"""
+
+  def __init__(self, queue_size=QUEUE_SIZE):
+    # (midi number, time.perf_counter() when the message was read)
+    # put() waits instead of dropping presses when the queue is full
+    self.presses = queue.Queue(queue_size)
+    self.port = None
+    self.stopped = threading.Event()  # set to end the playback thread of replay_file()
+
+  def open_port(self, port_name=None):
+    """Starts reading from a midi input port (the default port if port_name is None)
+      messages are handled on the midi backend's own thread
+      returns False if the port can't be opened, e.g. when no midi backend is installed"""
+    self.stop()
+    try:
+      self.port = mido.open_input(port_name, callback=self.add_message)
+    except (ImportError, OSError, IOError):
+      return False
+    return True
+
+  def replay_file(self, file_name, speed=1):
+    """Starts playing back the notes of a .mid file on a background thread,
+      as if they were pressed on a midi keyboard"""
+    self.stop()
+    self.stopped = threading.Event()
+    thread = threading.Thread(target=self.read_file,
+                              args=(file_name, speed, self.stopped),
+                              daemon=True)
+    thread.start()
+
+  def stop(self):
+    """Stops reading, presses that are already queued are kept"""
+    self.stopped.set()
+    if (self.port is not None):
+      self.port.close()
+      self.port = None
+
+  def read_file(self, file_name, speed, stopped):
+    """Queues the presses of a .mid file at the times they happen in the song, until stopped is set"""
+    next_time = time.perf_counter()
+    for msg in mido.MidiFile(file_name):  # msg.time is the delay in seconds since the last message
+      next_time += msg.time / speed
+      if (stopped.wait(max(0, next_time - time.perf_counter()))):
+        return
+      self.add_message(msg)
+
+  def add_message(self, msg):
+    """Queues a message if it presses a key"""
+    if (msg.type == "note_on" and msg.velocity > 0):
+      self.presses.put((msg.note, time.perf_counter()))
+
+  def drain(self):
+    """Returns every queued (midi number, press time) in the order they were pressed"""
+    presses = []
+    while (True):
+      try:
+        presses.append(self.presses.get_nowait())
+      except queue.Empty:
+        return presses
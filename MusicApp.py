@@ -230,7 +230,8 @@ class Song():
 
         # read from the midi file
         song_file = "midi_files\\" + selected_song[0]
-        self.notes_data, self.tempo = ReadMidi.readMidi(song_file)
+        self.notes_data, tempo_map, meter_map = ReadMidi.readMidi(song_file)
+        self.tempo = int(tempo_map.bpm_at(0)) # this version scrolls at the tempo the song starts with
 
         self.notes_list = []
         self.barlines_list = []
@@ -248,13 +249,13 @@ class Song():
         
     def load_notes(self):
         """add notes to the list of notes"""
-        for pitch_num, note_letter, note_length, absolute_time in self.notes_data: 
+        for pitch_num, note_letter, note_length, absolute_time, _ in self.notes_data: 
             note = Note(pitch_num, note_letter, note_length, absolute_time, self.time_signature, self.key_signature)
             self.notes_list.append(note)
     
     def load_barlines(self): 
         """add barlines to the list of barlines"""
-        total_beats = int(self.notes_data[-1][-1] * (self.time_signature[1] / 4))
+        total_beats = int(self.notes_data[-1][3] * (self.time_signature[1] / 4))
         for beat in range(total_beats):
             beat += 1 # beats start at 1
             if (beat % self.time_signature[0] == 0): 
@@ -0,0 +1,139 @@
+# Column storage for the notes of a song, so each frame works on whole arrays instead of one object per note
+
+import numpy as np  # https://numpy.org/doc/stable/user/basics.rec.html
+
+NOTE_DTYPE = np.dtype([
+  ("pitch", "u1"),  # midi number
+  ("start", "f8"),  # beats since the start of the song
+  ("length", "f8"),  # beats
+  ("x", "f8"),  # x coordinate before the song has scrolled, increases with start
+  ("y", "f8"),
+  ("ledger", "?"),  # needs a ledger line
+  ("played", "?"),
+])
+
+
+class IntervalIndex():
+  """Finds the intervals [start, end) that contain a time, an interval of length 0 contains its start
+    time is split into equal buckets and each bucket stores the intervals that overlap it,
+    so a query only checks one bucket instead of every interval"""
+
+  def __init__(self, starts, ends, bucket_width=None):
+    """starts and ends are arrays with one value per interval"""
+    self.starts = np.asarray(starts, dtype=float)
+    self.ends = np.asarray(ends, dtype=float)
+    lengths = self.ends - self.starts
+    if (bucket_width is None):
+      # about as wide as a typical interval, so each interval is in one or two buckets
+      bucket_width = float(np.median(lengths)) if len(lengths) > 0 else 1.0
+    self.bucket_width = max(bucket_width, 1e-3)
+    first_buckets = np.floor(self.starts / self.bucket_width).astype(np.int64)
+    last_buckets = np.maximum(
+      np.ceil(self.ends / self.bucket_width).astype(np.int64) - 1, first_buckets)
+    first_buckets = np.maximum(first_buckets, 0)
+    last_buckets = np.maximum(last_buckets, first_buckets)
+    # one entry for every (bucket, interval) pair, grouped by bucket
+    counts = last_buckets - first_buckets + 1
+    members = np.repeat(np.arange(len(self.starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+    buckets = np.repeat(first_buckets, counts) + offsets
+    order = np.argsort(buckets, kind="stable")
+    self.members = members[order]
+    bucket_count = int(last_buckets.max()) + 1 if len(counts) > 0 else 0
+    self.bucket_bounds = np.searchsorted(buckets[order],
+                                         np.arange(bucket_count + 1))
+
+  def at(self, time):
+    """Returns the indices of the intervals with start <= time < end or start == time, in order"""
+    bucket = int(time // self.bucket_width)
+    if (bucket < 0 or bucket >= len(self.bucket_bounds) - 1):
+      return np.array([], dtype=np.int64)
+    candidates = self.members[self.bucket_bounds[bucket]:self.
+                              bucket_bounds[bucket + 1]]
+    starts = self.starts[candidates]
+    # notes released on the tick they were pressed have length 0, but must still be in their own chord
+    inside = (starts <= time) & ((self.ends[candidates] > time) |
+                                 (starts == time))
+    return candidates[inside]
+
+
+class NoteTable():
+  """Stores every note of a song as one row of a NumPy structured array, sorted by start time
+    the rows never move: scrolling only changes an offset, and because x increases with the row number
+    the notes on the window are always one slice of rows that is found with a binary search"""
+
+  def __init__(self, pitches, starts, lengths, xs, ys, ledgers):
+    """Create one row per note, every argument is a list with one value per note
+      the notes must be sorted by start time so xs never decreases"""
+    self.rows = np.zeros(len(pitches), dtype=NOTE_DTYPE)
+    self.rows["pitch"] = pitches
+    self.rows["start"] = starts
+    self.rows["length"] = lengths
+    self.rows["x"] = xs
+    self.rows["y"] = ys
+    self.rows["ledger"] = ledgers
+    # finds the notes that are sounding at a beat
+    self.intervals = IntervalIndex(self.rows["start"],
+                                   self.rows["start"] + self.rows["length"])
+    self.offset = 0.0  # how far the notes have scrolled to the right
+    self.first_unplayed = 0  # every row before this one has been played
+
+  def __len__(self):
+    return len(self.rows)
+
+  def x(self, index):
+    """Returns the current x coordinate of a note"""
+    return float(self.rows["x"][index]) + self.offset
+
+  def first_at(self, x):
+    """Returns the index of the first note with a current x coordinate >= x"""
+    return int(np.searchsorted(self.rows["x"], x - self.offset, "left"))
+
+  def scroll(self, dx):
+    """Moves every note dx pixels to the right"""
+    self.offset += dx
+
+  def scroll_limit(self, stop_x):
+    """Returns how many pixels the notes can move left before a note that hasn't been played passes stop_x"""
+    if (self.first_unplayed == len(self.rows)):
+      return np.inf
+    return max(0.0, self.x(self.first_unplayed) - stop_x)
+
+  def visible(self, left, right):
+    """Returns the indices of the notes with left <= x < right"""
+    return range(self.first_at(left), self.first_at(right))
+
+  def remaining(self, left):
+    """Returns True if any note hasn't scrolled past left yet"""
+    return (len(self.rows) > 0 and self.x(len(self.rows) - 1) >= left)
+
+  def current_note(self, left):
+    """Returns the index of the first note that hasn't been played or scrolled past left, or None"""
+    index = max(self.first_unplayed, self.first_at(left))
+    # only skips notes that were played early, e.g. the other notes of a chord
+    while (index < len(self.rows) and self.rows["played"][index]):
+      index += 1
+    if (index == len(self.rows)):
+      return None
+    return index
+
+  def active_at(self, beat):
+    """Returns the indices of the notes that are sounding at a beat"""
+    return self.intervals.at(beat)
+
+  def current_chord(self, left):
+    """Returns the indices of the notes that still have to be played at the start of the current note
+      (the current note, the notes that start with it and held notes that haven't been played)"""
+    index = self.current_note(left)
+    if (index is None):
+      return []
+    chord = self.active_at(self.rows["start"][index])
+    return chord[~self.rows["played"][chord]]
+
+  def play(self, index):
+    """Marks a note as played"""
+    self.rows["played"][index] = True
+    while (self.first_unplayed < len(self.rows) and
+           self.rows["played"][self.first_unplayed]):
+      self.first_unplayed += 1
@@ -0,0 +1,65 @@
+# Loads songs on background threads before they are chosen, so opening a song only has to draw it
+#   the songs that might be chosen next are loaded in order, songs that are no longer wanted are cancelled,
+#   and finished songs are dropped (oldest first) once they use more memory than the budget
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor  # https://docs.python.org/3/library/concurrent.futures.html
+
+WORKERS = 2
+MAX_BYTES = 64 * 1024 * 1024  # memory for loaded songs that haven't been chosen
+
+
+class Prefetcher():
+  """Runs load(song) on a thread pool for the songs that might be chosen next"""
+
+  def __init__(self, load, workers=WORKERS, max_bytes=MAX_BYTES):
+    """load(song) returns the loaded song, which must have an nbytes() method"""
+    self.load = load
+    self.executor = ThreadPoolExecutor(workers)
+    self.max_bytes = max_bytes
+    self.futures = OrderedDict()  # song file name -> Future, oldest first
+    self.wanted = []  # song file names, in the order they were asked for
+    self.lock = threading.RLock()  # futures and wanted are also changed by the worker threads
+
+  def prefetch(self, songs):
+    """Starts loading songs (most likely first) and cancels the songs that were wanted before but aren't now"""
+    with self.lock:
+      self.wanted = [song[0] for song in songs]
+      for file_name, future in list(self.futures.items()):
+        if (file_name not in self.wanted and future.cancel()):  # only waiting songs can be cancelled
+          del self.futures[file_name]
+      for song in songs:
+        if (song[0] not in self.futures):
+          future = self.executor.submit(self.load, song)
+          self.futures[song[0]] = future
+          future.add_done_callback(lambda future: self.evict())
+      self.evict()
+
+  def take(self, song):
+    """Returns the loaded song, waiting for it if it is still loading, or loads it now if it wasn't prefetched
+      the prefetcher forgets the song, so the caller can change it"""
+    with self.lock:
+      future = self.futures.pop(song[0], None)
+    if (future is None or future.cancelled()):
+      return self.load(song)
+    return future.result()
+
+  def evict(self):
+    """Forgets the oldest finished songs that aren't wanted any more until the finished songs fit in max_bytes
+      can be called from the worker threads"""
+    with self.lock:
+      futures = list(self.futures.items())
+      total_bytes = 0
+      for _, future in futures:
+        if (future.done() and not future.cancelled() and
+            future.exception() is None):
+          total_bytes += future.result().nbytes()
+      for file_name, future in futures:
+        if (total_bytes <= self.max_bytes):
+          break
+        if (future.done() and file_name not in self.wanted):
+          if (not future.cancelled() and future.exception() is None):
+            total_bytes -= future.result().nbytes()
+          del self.futures[file_name]
+
@@ -2,72 +2,149 @@
 
 # pip install mido==1.2.9
 import mido
-from mido import MidiFile, MetaMessage
+import numpy as np
+from mido import MidiFile
+import TimeMap
 
 
 def readMidi(filename): 
-    """Returns a list of note data, time signature, and tempo of a given filename"""
+    """Returns the list of note data, tempo map and meter map of a given filename"""
     mid = MidiFile(filename, clip=True)
 
-    # extract information from the midi file
-    tempo = get_tempo(mid)
+    # extract the tempo changes, time signature changes and lists of notes (pitch, length) in one pass through the midi file
+    tempo_map, meter_map, notes_data = extract_events(mid)
 
-    # get lists of notes (pitch, length)
-    notes_data = get_notes(mid, tempo)
+    return notes_data, tempo_map, meter_map
 
-    return notes_data, tempo
+def extract_events(midObj): 
+    """Returns the tempo map, meter map (see TimeMap.py) and list of notes in one pass through the midi file
+    each note_on is paired with its release, so chords and overlapping notes keep their real start times and lengths
+    each note is a tuple: (midi number, note pitch, note length in beats, absolute time of the release in beats,
+    absolute time of the start in beats), the start is kept so notes of a chord start at exactly the same time
+    notes are sorted by the time they start"""
+    tempo_changes = [] # (tick, microseconds per beat)
+    time_signature_changes = [] # (tick, (numerator, denominator))
+    notes_list = []
+    held_notes = {} # (channel, midi number) -> start ticks of the notes that haven't been released, oldest first
+    ticks_per_beat = midObj.ticks_per_beat
+    tick = 0
+    for tick, msg in merge_messages(midObj): 
+        msg_type = msg.type
+        if msg_type == "note_on" and msg.velocity > 0: 
+            held_notes.setdefault((msg.channel, msg.note), []).append(tick)
+        # a note_on with velocity 0 is also a release
+        elif msg_type == "note_off" or msg_type == "note_on": 
+            start_ticks = held_notes.get((msg.channel, msg.note))
+            if start_ticks: # ignore releases of notes that were never pressed
+                notes_list.append(make_note(msg.note, start_ticks.pop(0), tick, ticks_per_beat))
+        elif msg_type == "set_tempo": 
+            tempo_changes.append((tick, msg.tempo))
+        elif msg_type == "time_signature": 
+            time_signature_changes.append((tick, (msg.numerator, msg.denominator)))
+    # notes that are never released end with the song
+    for (channel, midi_num), start_ticks in held_notes.items(): 
+        for start_tick in start_ticks: 
+            notes_list.append(make_note(midi_num, start_tick, tick, ticks_per_beat))
+    notes_list.sort(key=lambda note: (note[4], note[0])) # by start time, then pitch
+    tempo_map = get_tempo_map(tempo_changes, ticks_per_beat)
+    meter_map = get_meter_map(time_signature_changes, ticks_per_beat)
+    return tempo_map, meter_map, notes_list
+
+def get_changes(changes, default): 
+    """Returns (ticks, values) of the changes that take effect, in order
+    a change replaces an earlier one at the same tick, and the song starts with default until the first change"""
+    effective = {} # tick -> value, dicts keep the order the ticks were added
+    for tick, value in changes: 
+        effective[tick] = value
+    if 0 not in effective: 
+        effective = {0: default, **effective}
+    return list(effective.keys()), list(effective.values())
+
+def get_tempo_map(tempo_changes, ticks_per_beat): 
+    """Returns the TempoMap of a list of (tick, microseconds per beat), 120 bpm until the first tempo"""
+    ticks, tempos = get_changes(tempo_changes, mido.bpm2tempo(TimeMap.DEFAULT_BPM))
+    # converted all at once: ticks to beats, microseconds per beat to beats per minute
+    return TimeMap.TempoMap(np.array(ticks) / ticks_per_beat, 60000000 / np.array(tempos))
+
+def get_meter_map(time_signature_changes, ticks_per_beat): 
+    """Returns the MeterMap of a list of (tick, (numerator, denominator)), 4/4 until the first time signature"""
+    ticks, time_signatures = get_changes(time_signature_changes, TimeMap.DEFAULT_TIME_SIGNATURE)
+    return TimeMap.MeterMap(np.array(ticks) / ticks_per_beat, time_signatures)
+
+def make_note(midi_num, start_tick, end_tick, ticks_per_beat): 
+    """Returns the note tuple for a note held from start_tick to end_tick"""
+    note_length = (end_tick - start_tick) / ticks_per_beat
+    absolute_time = end_tick / ticks_per_beat
+    start_time = start_tick / ticks_per_beat
+    return (midi_num, get_pitch(midi_num), note_length, absolute_time, start_time)
+
+def merge_messages(midObj): 
+    """Returns a list of (absolute time in ticks, message) for the messages of all tracks, sorted by time
+    messages at the same time keep the order of their tracks, like mido.merge_tracks() but without copying every message"""
+    timed_messages = []
+    for track in midObj.tracks: 
+        tick = 0
+        for msg in track: 
+            tick += msg.time
+            timed_messages.append((tick, msg))
+    timed_messages.sort(key=lambda timed_message: timed_message[0])
+    return timed_messages
 
 def get_time_signature(midObj): 
     """Returns the time signature as a tuple: (numerator, denominator)"""
     for track in midObj.tracks: 
         for msg in track:
             if msg.type == "time_signature": 
-                # parse through the string for the numerator and denominator
-                msg = str(msg)
-                numerator = int(msg[msg.index("numerator=") + len("numerator="): msg.index(" denominator")])
-                denominator = int(msg[msg.index("denominator=") + len("denominator="): msg.index(" clocks_per_click")])
-                return (numerator, denominator)
+                return (msg.numerator, msg.denominator)
     # return a 4/4 time signature if none specified
     return (4,4)
 
+# key signatures by number of sharps (negative for flats), from 7 flats to 7 sharps
+MAJOR_KEYS = ['Cb', 'Gb', 'Db', 'Ab', 'Eb', 'Bb', 'F', 'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#']
+MINOR_KEYS = [key + 'm' for key in ['Ab', 'Eb', 'Bb', 'F', 'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#', 'G#', 'D#', 'A#']]
+
+def get_key_signature(midObj): 
+    """Returns the key signature written in the midi file as a string: "N sharps" or "N flats", or None if there isn't one"""
+    for track in midObj.tracks: 
+        for msg in track:
+            if msg.type == "key_signature": 
+                keys = MAJOR_KEYS if msg.key in MAJOR_KEYS else MINOR_KEYS
+                return format_key_signature(keys.index(msg.key) - 7)
+    return None
+
+def format_key_signature(sharps): 
+    """Returns the key signature string for a number of sharps (negative for flats), ex. -3 -> "3 flats" """
+    if sharps < 0: 
+        return str(-sharps) + " flats"
+    return str(sharps) + " sharps"
+
 def get_tempo(midObj): 
     """Returns the tempo converted to bpm"""
     for track in midObj.tracks: 
         for msg in track:
-            msg = str(msg)
-            if "tempo" in msg: 
-                # parse through the string for the tempo
-                tempo = int(msg[msg.index("tempo=") + len("tempo="):msg.index(" time=")])
-                return int(mido.tempo2bpm(tempo))
+            if msg.type == "set_tempo": 
+                return int(mido.tempo2bpm(msg.tempo))
     # return a default of 120 bpm if tempo not specified
     return 120
 
 def get_notes(midObj, tempo): 
-    """Returns a list of tuples: (midi number, note pitch, note length in beats) based on data from the input"""
-    notes_list = []
-    absolute_time = 0
-    for msg in midObj: 
-        # based on note releases
-        if "note_off" in str(msg): 
-            midi_num = msg.note
-            note_pitch = get_pitch(midi_num) # convert midi note number to letter form
-            note_length = (msg.time*tempo/60) # rounding
-            absolute_time += note_length
-            notes_list.append((midi_num, note_pitch, note_length, absolute_time))
-    return notes_list
+    """Returns a list of tuples: (midi number, note pitch, note length in beats) based on data from the input
+    tempo is no longer needed because note lengths are read in ticks"""
+    return extract_events(midObj)[2]
+
+PITCHES = ['C', 'C#/D♭', 'D', 'D#/E♭', 'E', 'F', 'F#/G♭', 'G', 'G#/A♭', 'A', 'A#/B♭', 'B']
 
 def get_pitch(midi_num): 
     """Returns the note letter of a given midi number"""
-    PITCHES = ['C', 'C#/D♭', 'D', 'D#/E♭', 'E', 'F', 'F#/G♭', 'G', 'G#/A♭', 'A', 'A#/B♭', 'B']
-    pitch = PITCHES[midi_num % 12]
-    return pitch
+    return PITCHES[midi_num % 12]
 
 if __name__ == "__main__": 
     MUSICFILE = "Amazing_Grace.mid"
-    notes, time_signature, tempo = readMidi(MUSICFILE)
+    tempo_map, meter_map, notes = extract_events(MidiFile(MUSICFILE, clip=True))
+    time_signature = meter_map.signature_at(0)
     print(notes)
     print("Time Signature: " + str(time_signature[0]) + "/" + str(time_signature[1]))
-    print("Tempo (BPM): " + str(tempo))
+    print("Tempo (BPM): " + str(tempo_map.bpm_at(0)))
 
 
 # figure out how to deal with a pickup
\ No newline at end of file
@@ -0,0 +1,273 @@
+# Rendering backends for the song display
+#   TurtleRenderer draws on the turtle window, RecordingRenderer only records what would be drawn
+#   so songs can be played and measured without a display
+
+import itertools
+import time  # https://docs.python.org/3/library/time.html#time.perf_counter
+import turtle  # documentation: https://docs.python.org/3/library/turtle.html
+import tkinter as tk  # resource: https://www.tutorialspoint.com/python/python_gui_programming.htm
+from collections import Counter
+
+
+class TurtleRenderer():
+  """Draws with turtles on a Tk window"""
+
+  def __init__(self, width, height, title):
+    """Create the window, drawing animations are turned off so the window only changes on update()"""
+    self.window = turtle.Screen()
+    self.window.setup(width, height)
+    self.window.title(title)
+    self.window.tracer(0)  # turn off drawing animations
+    self.tk_canvas = self.window.getcanvas()
+
+  def create_painter(self):
+    """Returns a new turtle"""
+    return turtle.Turtle()
+
+  def shift(self, painter, dx):
+    """Moves everything the painter has already drawn dx pixels to the right without redrawing it"""
+    for item in painter.items:
+      self.tk_canvas.move(item, dx, 0)
+    for stamp in painter.stampItems:  # compound shapes are stamped as a tuple of items
+      for item in (stamp if isinstance(stamp, tuple) else (stamp, )):
+        self.tk_canvas.move(item, dx, 0)
+
+  def add_shape(self, file_name):
+    """Registers a .gif file as a turtle shape"""
+    self.window.addshape(file_name)
+
+  def add_compound_shape(self, name, components):
+    """Registers a turtle shape made of polygons, components is a list of (points, fill color, outline color)
+      a fill color of "" leaves the polygon hollow"""
+    shape = turtle.Shape("compound")
+    for points, fill, outline in components:
+      shape.addcomponent(points, fill, outline)
+    self.window.register_shape(name, shape)
+
+  def add_label(self, text, x, y, font):
+    """Returns a label placed at canvas position (x, y)"""
+    label = tk.Label(self.tk_canvas.master,
+                     bg="white",
+                     height=1,
+                     font=font,
+                     text=text,
+                     border=0)
+    self.tk_canvas.create_window(x, y, window=label)
+    return label
+
+  def add_button(self, text, x, y, width, font, activebackground, command):
+    """Returns a button placed at canvas position (x, y) that calls command when clicked"""
+    button = tk.Button(self.tk_canvas.master,
+                       bg="white",
+                       height=1,
+                       width=width,
+                       font=font,
+                       text=text,
+                       border=0,
+                       activebackground=activebackground,
+                       command=command)
+    self.tk_canvas.create_window(x, y, window=button)
+    return button
+
+  def on_click(self, fun):
+    """Calls fun(x, y) when the window is clicked"""
+    self.window.onscreenclick(fun)
+
+  def on_key(self, fun, key):
+    """Calls fun() when key is pressed, key is a Tk key name such as "a" or "semicolon" """
+    self.window.onkeypress(fun, key)
+
+  def on_timer(self, fun, delay):
+    """Calls fun after delay milliseconds"""
+    self.window.ontimer(fun, delay)
+
+  def now(self):
+    """Returns the current time in seconds"""
+    return time.perf_counter()
+
+  def update(self):
+    """Shows everything that was drawn since the last update"""
+    self.window.update()
+
+  def mainloop(self):
+    """Handles events until the window is closed"""
+    self.window.listen()
+    self.window.mainloop()
+
+
+class RecordingWidget():
+  """Stands in for a Tk label or button"""
+
+  def __init__(self, text, command=None):
+    self.text = text
+    self.command = command
+
+  def config(self, text):
+    self.text = text
+
+  def destroy(self):
+    pass
+
+
+class RecordingPainter():
+  """Stands in for a turtle: keeps track of the position and pen, and records canvas items instead of drawing them"""
+
+  def __init__(self, renderer):
+    self.renderer = renderer
+    self.items = []  # ids of the canvas items this painter would have created
+    self.x = 0
+    self.y = 0
+    self.heading = 0
+    self.is_down = True
+    self.color_name = "black"
+    self.shape_name = "classic"
+
+  def create_item(self):
+    """Records a new canvas item drawn by this painter"""
+    self.items.append(self.renderer.create_item())
+
+  # pen and turtle settings
+  def speed(self, speed):
+    pass
+
+  def pensize(self, size):
+    pass
+
+  def hideturtle(self):
+    pass
+
+  def showturtle(self):
+    pass
+
+  def shape(self, name):
+    self.shape_name = name
+
+  def fillcolor(self, color):
+    pass
+
+  def pencolor(self, color=None):
+    if color is None:
+      return self.color_name
+    self.color_name = color
+
+  def color(self, color):
+    self.color_name = color
+
+  def begin_fill(self):
+    self.create_item()  # the filled polygon
+
+  def end_fill(self):
+    pass
+
+  # movement
+  def penup(self):
+    self.is_down = False
+
+  def pendown(self):
+    if not self.is_down:
+      self.create_item()  # every stroke is one line item
+    self.is_down = True
+
+  def goto(self, x, y):
+    self.x = x
+    self.y = y
+
+  def setx(self, x):
+    self.x = x
+
+  def sety(self, y):
+    self.y = y
+
+  def ycor(self):
+    return self.y
+
+  def setheading(self, heading):
+    self.heading = heading
+
+  def forward(self, distance):
+    self.renderer.operations["segment"] += 1
+
+  def circle(self, radius, extent):
+    self.renderer.operations["segment"] += 1
+
+  def write(self, text, **kwargs):
+    self.create_item()
+
+  def stamp(self):
+    self.renderer.operations["stamp"] += 1
+    for _ in range(self.renderer.shapes.get(self.shape_name, 1)):
+      self.create_item()  # one polygon per component
+
+  def clear(self):
+    self.renderer.operations["delete"] += len(self.items)
+    self.items = []
+
+
+class RecordingRenderer():
+  """Renders without a display: records canvas operations and runs timers on a simulated clock
+    the song logic runs exactly like it does on the turtle window
+    the clock jumps to each timer, and while a timer runs it also counts the real time the timer takes"""
+
+  def __init__(self):
+    self.operations = Counter()  # number of created, moved and deleted canvas items and traced segments
+    self.item_ids = itertools.count(1)
+    self.timers = []  # (time in seconds, order, function)
+    self.timer_order = itertools.count()
+    self.time = 0.0  # simulated clock in seconds
+    self.timer_start = None  # time.perf_counter() when the running timer started
+    self.click_handler = None
+    self.key_handlers = {}  # key name -> function
+    self.shapes = {}  # name of a compound shape -> number of polygons
+
+  def create_item(self):
+    """Returns the id of a new canvas item"""
+    self.operations["create"] += 1
+    return next(self.item_ids)
+
+  def create_painter(self):
+    return RecordingPainter(self)
+
+  def shift(self, painter, dx):
+    self.operations["move"] += len(painter.items)
+
+  def add_shape(self, file_name):
+    pass
+
+  def add_compound_shape(self, name, components):
+    self.shapes[name] = len(components)
+
+  def add_label(self, text, x, y, font):
+    return RecordingWidget(text)
+
+  def add_button(self, text, x, y, width, font, activebackground, command):
+    return RecordingWidget(text, command)
+
+  def on_click(self, fun):
+    self.click_handler = fun
+
+  def on_key(self, fun, key):
+    self.key_handlers[key] = fun
+
+  def on_timer(self, fun, delay):
+    self.timers.append((self.now() + delay / 1000, next(self.timer_order), fun))
+
+  def now(self):
+    if (self.timer_start is None):
+      return self.time
+    return self.time + time.perf_counter() - self.timer_start
+
+  def update(self):
+    self.operations["update"] += 1
+
+  def run_next_timer(self):
+    """Moves the simulated clock to the next timer and runs it, returns False if there are no timers left"""
+    if (len(self.timers) == 0):
+      return False
+    self.timers.sort()
+    due_time, _, fun = self.timers.pop(0)
+    self.time = max(self.time, due_time)
+    self.timer_start = time.perf_counter()
+    fun()
+    self.time = self.now()
+    self.timer_start = None
+    return True
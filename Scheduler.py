@@ -0,0 +1,29 @@
+# Decides how far the song scrolls each frame from the time that has passed, so the speed of the music
+# doesn't depend on the frame rate or on how fast the computer can draw
+
+
+class Scheduler():
+  """Converts elapsed wall-clock time into a scroll distance at a constant speed"""
+
+  def __init__(self, pixels_per_second, fps):
+    self.pixels_per_second = pixels_per_second
+    self.frame_time = 1 / fps  # seconds between frames at the target frame rate
+    self.last_time = None  # time of the previous frame in seconds
+
+  def advance(self, now):
+    """Returns how many pixels to scroll for a frame at time now (seconds, e.g. time.perf_counter())
+      if frames are late the distance covers all the time since the last frame, so slow frames are dropped
+      instead of slowing down the music"""
+    if (self.last_time is None):
+      self.last_time = now
+      return 0
+    elapsed = now - self.last_time
+    self.last_time = now
+    return elapsed * self.pixels_per_second
+
+  def frame_delay(self, now):
+    """Returns how many seconds to wait before the next frame to keep the target frame rate
+      returns 0 if the next frame is already late"""
+    if (self.last_time is None):
+      return 0
+    return max(0, self.last_time + self.frame_time - now)
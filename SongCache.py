@@ -0,0 +1,101 @@
+# Cache parsed songs on disk so each midi file is only parsed once
+
+import hashlib
+import os
+import threading
+import numpy as np  # https://numpy.org/doc/stable/reference/generated/numpy.savez.html
+import ReadMidi
+import TimeMap
+
+CACHE_DIR = ".song_cache"
+MAX_CACHE_BYTES = 50 * 1024 * 1024  # oldest entries are deleted once the cache is bigger than this
+CACHE_VERSION = 4  # increase when ReadMidi changes the note data so old entries are parsed again
+
+# the prefetch threads can save songs at the same time, only one of them evicts at a time
+evict_lock = threading.Lock()
+
+NOTE_DTYPE = np.dtype([("pitch", "u1"), ("length", "f8"), ("time", "f8"),
+                       ("start", "f8")])
+
+
+def get_cache_path(filename):
+  """Returns the path of the cache entry for a midi file, named after a hash of the file's contents"""
+  with open(filename, "rb") as file_obj:
+    file_hash = hashlib.sha1(file_obj.read()).hexdigest()
+  return os.path.join(CACHE_DIR, file_hash + ".npz")
+
+
+def read_song(filename):
+  """Returns the same (notes_data, tempo_map, meter_map) as ReadMidi.readMidi() but skips parsing if the song is cached"""
+  cache_path = get_cache_path(filename)
+  song = load_entry(cache_path)
+  if song is None:
+    song = ReadMidi.readMidi(filename)
+    save_entry(cache_path, *song)
+  return song
+
+
+def load_entry(cache_path):
+  """Returns (notes_data, tempo_map, meter_map) from a cache entry, or None if there is no usable entry"""
+  try:
+    with np.load(cache_path) as entry:
+      if int(entry["version"]) != CACHE_VERSION:
+        return None
+      notes = entry["notes"]
+      tempo_map = TimeMap.TempoMap(entry["tempo_beats"], entry["tempo_bpms"])
+      meter_map = TimeMap.MeterMap(entry["meter_starts"],
+                                   entry["meter_signatures"])
+  except (OSError, KeyError, ValueError):  # missing, corrupt or from an older format
+    return None
+  try:
+    os.utime(cache_path)  # mark as recently used
+  except FileNotFoundError:
+    pass  # evicted by another thread or process after it was read, the notes are still good
+  notes_data = [(pitch, ReadMidi.get_pitch(pitch), length, time, start)
+                for pitch, length, time, start in notes.tolist()]
+  return notes_data, tempo_map, meter_map
+
+
+def save_entry(cache_path, notes_data, tempo_map, meter_map, evict_entries=True):
+  """Writes the note data, tempo map and meter map to a cache entry and evicts old entries if the cache is too big
+    evict_entries can be False when many entries are written at once and evict() is called afterwards"""
+  notes = np.array([(note[0], note[2], note[3], note[4]) for note in notes_data],
+                   dtype=NOTE_DTYPE)
+  os.makedirs(CACHE_DIR, exist_ok=True)
+  # one temporary file per process and thread that is saving songs
+  temp_path = "%s.%d.%d.tmp" % (cache_path, os.getpid(), threading.get_ident())
+  with open(temp_path, "wb") as file_obj:
+    np.savez(file_obj,
+             version=CACHE_VERSION,
+             notes=notes,
+             tempo_beats=tempo_map.beats,
+             tempo_bpms=tempo_map.bpms,
+             meter_starts=meter_map.starts,
+             meter_signatures=meter_map.signatures)
+  os.replace(temp_path, cache_path)  # never leave a half-written entry behind
+  if (evict_entries):
+    evict(MAX_CACHE_BYTES)
+
+
+def evict(max_bytes):
+  """Deletes the least recently used entries until the cache is at most max_bytes
+    entries deleted by another process while this runs are skipped"""
+  with evict_lock:
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+      if name.endswith(".npz"):
+        try:
+          stat = os.stat(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+          continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort()  # oldest first
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, name in entries:
+      if total_bytes <= max_bytes:
+        break
+      try:
+        os.remove(os.path.join(CACHE_DIR, name))
+      except FileNotFoundError:
+        pass  # already deleted, it still no longer counts
+      total_bytes -= size
@@ -0,0 +1,115 @@
+# Tempo and time signature changes of a song, stored as arrays so times can be converted for many notes at once
+#   positions are in beats (quarter notes) from the start of the song, like the note data from ReadMidi
+#   each map has one row per change, with cumulative values at the start of every change, so a lookup is
+#   one binary search and a few multiplications no matter how many changes the song has
+
+import math
+import numpy as np
+
+DEFAULT_BPM = 120  # tempo of a midi file until its first tempo change
+DEFAULT_TIME_SIGNATURE = (4, 4)
+EPSILON = 1e-9  # rounding errors allowed when a position falls exactly on a barline
+
+
+class TempoMap():
+  """Converts between beats and seconds for a song that changes tempo"""
+
+  def __init__(self, beats, bpms):
+    """beats are where each tempo starts (sorted, the first is 0), bpms are the tempos in quarter notes per minute"""
+    self.beats = np.asarray(beats, dtype=float)
+    self.bpms = np.asarray(bpms, dtype=float)
+    seconds_per_beat = 60 / self.bpms
+    # seconds from the start of the song to the start of each tempo
+    self.seconds = np.concatenate(
+      ([0.0], np.cumsum(np.diff(self.beats) * seconds_per_beat[:-1])))
+
+  def seconds_at(self, beats):
+    """Returns the time in seconds of positions in beats, beats can be a number or an array"""
+    index = np.maximum(np.searchsorted(self.beats, beats, "right") - 1, 0)
+    return self.seconds[index] + (beats - self.beats[index]) * 60 / self.bpms[index]
+
+  def bpm_at(self, beats):
+    """Returns the tempo at positions in beats, beats can be a number or an array"""
+    index = np.maximum(np.searchsorted(self.beats, beats, "right") - 1, 0)
+    return self.bpms[index]
+
+
+class MeterMap():
+  """Where the barlines of a song are when it changes time signature
+    a time signature change always starts a new measure, so there is a barline on every change except the first"""
+
+  def __init__(self, starts, signatures, measure_beats=None):
+    """starts are the beats where each time signature starts (sorted, the first is 0)
+      signatures are (numerator, denominator) for each start
+      measure_beats are the measure lengths in beats, numerator quarter notes of the denominator's length if not given
+      (the staff used to make a measure numerator beats long whatever the denominator, see SongLayout in main.py)"""
+    self.starts = np.asarray(starts, dtype=float)
+    self.signatures = np.asarray(signatures, dtype=int).reshape(-1, 2)
+    if (measure_beats is None):
+      measure_beats = self.signatures[:, 0] * 4 / self.signatures[:, 1]
+    self.measure_beats = np.asarray(measure_beats, dtype=float)  # measure length in beats
+    # barlines from the start of the song up to and including the start of each time signature
+    measures = np.ceil(np.diff(self.starts) / self.measure_beats[:-1] - EPSILON)
+    self.barlines = np.concatenate(([0], np.cumsum(measures))).astype(int)
+    # distance of each time signature's start, barline included (see first_barline_from())
+    self.start_distances = self.starts + self.barlines
+    self.load_distances()
+
+  def load_distances(self):
+    """store the beats where the scrolling distance per beat changes, and the distance at each of them
+      the barline of a measure is spread over that measure, so a measure cut short by a time signature change
+      gets its own point: its barline is spread over fewer beats"""
+    beats = [self.starts[0]]
+    distances = [self.start_distances[0]]
+    for index in range(1, len(self.starts)):
+      previous = index - 1
+      full_measures = np.floor((self.starts[index] - self.starts[previous]) /
+                               self.measure_beats[previous] + EPSILON)
+      short_start = self.starts[previous] + full_measures * self.measure_beats[previous]
+      if (full_measures > 0 and short_start < self.starts[index] - EPSILON):
+        beats.append(short_start)
+        distances.append(short_start + self.barlines[previous] + full_measures)
+      beats.append(self.starts[index])
+      distances.append(self.start_distances[index])
+    self.distance_beats = np.array(beats)
+    self.distances = np.array(distances)
+
+  def signature_at(self, beat):
+    """Returns the (numerator, denominator) of the time signature at a position in beats"""
+    index = max(int(np.searchsorted(self.starts, beat, "right")) - 1, 0)
+    return tuple(int(num) for num in self.signatures[index])
+
+  def barlines_through(self, beats):
+    """Returns the number of barlines at or before positions in beats, beats can be a number or an array"""
+    index = np.maximum(np.searchsorted(self.starts, beats, "right") - 1, 0)
+    measures = np.floor((beats - self.starts[index]) / self.measure_beats[index] + EPSILON)
+    return self.barlines[index] + np.maximum(measures, 0).astype(int)
+
+  def barline_beat(self, number):
+    """Returns the position in beats of a barline, barlines are numbered from 1"""
+    index = int(np.searchsorted(self.barlines, number, "left")) - 1
+    beat = self.starts[index] + (number - self.barlines[index]) * self.measure_beats[index]
+    if (index + 1 < len(self.starts)):
+      beat = min(beat, self.starts[index + 1])  # the last measure before a change can be cut short
+    return float(beat)
+
+  def first_barline_from(self, distance):
+    """Returns the number of the first barline at or after a distance from the start of the song
+      distance is measured in beats, with one extra beat for every barline before it (see get_x() in main.py)"""
+    index = max(int(np.searchsorted(self.start_distances, distance, "right")) - 1, 0)
+    # every measure after the start takes its beats and one beat for its barline
+    measures = math.ceil((distance - self.start_distances[index]) /
+                         (self.measure_beats[index] + 1) - EPSILON)
+    return max(1, int(self.barlines[index]) + measures)
+
+  def distance_at(self, beats):
+    """Returns the distance from the start of the song of positions in beats, beats can be a number or an array
+      the extra beat of each barline is spread evenly over its measure, the same way the song scrolls"""
+    beats = np.asarray(beats, dtype=float)
+    last_beat = self.distance_beats[-1]
+    measure_beats = self.measure_beats[-1]
+    # after the last change every measure is full length
+    after_last = self.distances[-1] + (beats - last_beat) * (measure_beats +
+                                                              1) / measure_beats
+    return np.where(beats > last_beat, after_last,
+                    np.interp(beats, self.distance_beats, self.distances))
@@ -8,21 +8,31 @@
 #############################################################################################################
 #   Config
 #############################################################################################################
-import turtle  # documentation: https://docs.python.org/3/library/turtle.html
+import argparse  # https://docs.python.org/3/library/argparse.html
+import math
 import tkinter as tk  # resource: https://www.tutorialspoint.com/python/python_gui_programming.htm
 # resource: https://compucademy.net/python-turtle-graphics-and-tkinter-gui-programming/
-import ReadMidi  # created by me, utilizes the mido module: https://mido.readthedocs.io/en/latest/
-import pygame.time  # for maintaining a consistent frames per second
-import time  # https://www.tutorialspoint.com/python/time_sleep.htm
+import numpy as np  # note positions and lookup tables
+import Render  # draws on the turtle window, or records the drawing when there is no display
+import Audio  # synthesizes and mixes the piano sounds
+import Latency  # times key presses until the played note is on the window
+import MidiInput  # note presses from a midi keyboard or a replayed .mid file
+import SongCache  # skips parsing the midi file if the song was opened before
+import Catalog  # song list that can be searched and read one page at a time
+import Prefetch  # loads the songs that might be chosen next on background threads
+import KeyDetection  # finds the key signature of songs that don't have one
+import TimeMap  # tempo and time signature changes of a song
+from NoteTable import NoteTable  # stores the notes of a song as numpy columns
+from Scheduler import Scheduler  # scrolls the song based on time instead of frames
 
 #   screen settings
 WINDOW_WIDTH = 1000
 WINDOW_HEIGHT = 600
-window = turtle.Screen()
-window.setup(WINDOW_WIDTH, WINDOW_HEIGHT)
-window.title("Music App")
-window.tracer(0)  # turn off drawing animations
-tk_canvas = window.getcanvas()
+renderer = None  # set with use_renderer(), Render.TurtleRenderer when running the app
+audio = Audio.AudioEngine()
+latency = Latency.LatencyMonitor()
+midi_input = MidiInput.MidiInput()
+midi_replay = None  # (.mid file, speed) played back as midi input whenever a song starts
 
 #   text
 TURTLE_FONT = ('Times', 30, 'italic')
@@ -34,28 +44,42 @@ NOTE_DISTANCE = NOTE_SIZE * 5.91  # determines vertical distance of notes (one h
 clef = "trebleClef.gif"  # PICTURE LINK: https://www.google.com/url?sa=i&url=https%3A%2F%2Fwww.stickpng.com%2Fimg%2Fmiscellaneous%2Fmusic-symbols%2Ftreble-clef&psig=AOvVaw1SAxxlXKXa-HLxdXcSqLAz&ust=1619571929178000&source=images&cd=vfe&ved=0CAIQjRxqFwoTCPjJ-N6dnfACFQAAAAAdAAAAABAD
 # Convert to GIF: https://ezgif.com/jpg-to-gif
 keyboard_pic = "keyboard.gif"  # http://clipart-library.com/clipart/8T6og5E8c.htm
+# computer keys -> midi numbers, the home row is C4 to F5 and the row above is the black keys
+KEY_BINDINGS = {
+  "a": 60, "w": 61, "s": 62, "e": 63, "d": 64, "f": 65, "t": 66, "g": 67, "y": 68, "h": 69,
+  "u": 70, "j": 71, "k": 72, "o": 73, "l": 74, "p": 75, "semicolon": 76, "apostrophe": 77
+}
+
+#   scrolling
+TARGET_FPS = 60  # frames are dropped if the computer can't keep up, the music keeps its tempo
+BEAT_DISTANCE = WINDOW_WIDTH / 8  # horizontal distance between beats (and between a beat and a barline)
+LEFT_EDGE = -WINDOW_WIDTH / 2 + 210  # notes and barlines are deleted once they pass this x coordinate
+RIGHT_EDGE = WINDOW_WIDTH / 2 + 50  # notes and barlines are drawn once they pass this x coordinate
+STOP_X = -WINDOW_WIDTH / 2 + 270  # notes that haven't been played stop here
+
+#   latency measurements
+LATENCY_OVERLAY_KEY = "F2"  # shows or hides the latency of the last presses
+LATENCY_SAVE_KEY = "F3"  # saves the latency of the last presses to LATENCY_FILE .json and .csv
+LATENCY_FILE = "latency"
+LATENCY_OVERLAY_FRAMES = 15  # the overlay text is updated every this many frames
+show_latency = False  # the overlay stays on when the next song is opened
+
+#   key signature in the song list that means "detect it from the notes"
+AUTO_KEY = "auto"
 
 #   file to store song information
 CSV_FILE = "MidiFiles.csv"  # midi files created using https://onlinesequencer.net/ and https://signal.vercel.app/edit
+PAGE_SIZE = 50  # songs added to the song list at a time, more are added when it is scrolled to the bottom
+PREFETCH_NEIGHBOURS = 1  # songs above and below the song under the mouse that are loaded ahead of time
 
 
-def read_csv(file_name):
-  """get song data from csv file
-    returns a list of lists 
-    each element: [str file_name, str time_signature, int pickup, str key_signature, int song_number]"""
-  file_obj = open(file_name)
-  song_list = []
-  for song_num, line in enumerate(file_obj):
-    if song_num != 0:
-      contents = line.split(", ")
-      contents[1] = [int(num) for num in contents[1].split("/")
-                     ]  # ex. turns "4/4" into [4,4]
-      contents[2] = int(contents[2])  # pickup
-      contents[-1] = contents[-1].strip("\n")  # remove \n from last element
-      contents.append(song_num)  # add song number
-      song_list.append(contents)
-  file_obj.close()
-  return song_list
+def use_renderer(new_renderer):
+  """Sets the renderer that songs, notes and barlines draw with"""
+  global renderer, painter_pool, note_glyphs, background
+  renderer = new_renderer
+  painter_pool = PainterPool()  # painters belong to one renderer
+  note_glyphs = set()  # and so do shapes
+  background = None  # drawn by the first song
 
 
 #############################################################################################################
@@ -69,14 +93,18 @@ class Song_Selection():
   def __init__(self, window, file_name):
     """Create frames and widgets for Song Selection box
         Frame: frame 
-        Widgets: instructions, listbox, scrollbar"""
-
-    # store a list of all the songs
-    self.song_list = read_csv(file_name)
+        Widgets: instructions, search box, listbox, scrollbar"""
+
+    # songs are read from the catalog one page at a time
+    self.catalog = Catalog.Catalog()
+    self.catalog.import_csv(file_name)
+    self.shown_songs = []  # songs in the listbox, in the same order
+    self.all_shown = False  # True when every song that matches the search is in the listbox
+    self.prefetcher = Prefetch.Prefetcher(SongLayout)
     self.song = None
 
     # menu button to go back to song selection
-    self.menu_button = tk.Button(tk_canvas.master,
+    self.menu_button = tk.Button(renderer.tk_canvas.master,
                                  bg="white",
                                  height=1,
                                  width=7,
@@ -85,10 +113,10 @@ class Song_Selection():
                                  border=0,
                                  activebackground="PaleGreen1",
                                  command=self.show)
-    tk_canvas.create_window(400, -250, window=self.menu_button)
+    renderer.tk_canvas.create_window(400, -250, window=self.menu_button)
 
     # back button to go back to the song
-    self.back_button = tk.Button(tk_canvas.master,
+    self.back_button = tk.Button(renderer.tk_canvas.master,
                                  bg="white",
                                  height=1,
                                  width=7,
@@ -97,11 +125,15 @@ class Song_Selection():
                                  border=0,
                                  activebackground="PaleGreen1",
                                  command=self.hide)
-    tk_canvas.create_window(400, -250, window=self.back_button)
+    renderer.tk_canvas.create_window(400, -250, window=self.back_button)
 
     # song selection frame
-    self.frame = tk.Frame(tk_canvas.master, bg="white")
-    tk_canvas.create_window(0, 0, window=self.frame, width=1000, height=600)
+    self.frame = tk.Frame(renderer.tk_canvas.master, bg="white")
+    renderer.tk_canvas.create_window(0,
+                                     0,
+                                     window=self.frame,
+                                     width=1000,
+                                     height=600)
 
     # instructions
     self.instructions = tk.Label(self.frame,
@@ -113,14 +145,26 @@ class Song_Selection():
                            padx=WINDOW_WIDTH / 2 - 125,
                            pady=(100, 10))
 
+    # search box, the listbox only shows the songs with the text in their title
+    self.search_text = tk.StringVar()
+    self.search_text.trace_add("write", lambda *args: self.update_listbox())
+    self.search_box = tk.Entry(self.frame,
+                               bg="white",
+                               relief="solid",
+                               border=1,
+                               font=TK_FONT,
+                               textvariable=self.search_text)
+    self.search_box.grid(row=2, column=2, pady=(0, 10))
+
     # listbox to display the songs
     self.listbox = tk.Listbox(self.frame,
                               bg="white",
                               relief="flat",
                               font=TK_FONT,
                               highlightthickness=0)
-    self.listbox.grid(row=2, column=2, ipadx=50, ipady=10)
+    self.listbox.grid(row=3, column=2, ipadx=50, ipady=10)
     self.listbox.bind("<<ListboxSelect>>", self.listbox_select)
+    self.listbox.bind("<Motion>", self.listbox_hover)
     self.update_listbox()
 
     # scrollbar for the listbox
@@ -128,54 +172,84 @@ class Song_Selection():
                                   orient="vertical",
                                   width=16,
                                   highlightthickness=0)
-    self.scrollbar.grid(row=2, column=2, sticky="ns", padx=(325, 0))
-    self.listbox.config(yscrollcommand=self.scrollbar.set)
+    self.scrollbar.grid(row=3, column=2, sticky="ns", padx=(325, 0))
+    self.listbox.config(yscrollcommand=self.listbox_scroll)
     self.scrollbar.config(command=self.listbox.yview)
 
   def update_listbox(self):
-    """Read the songs and put them in the listbox display"""
+    """Shows the first page of the songs that match the search in the listbox display"""
     self.listbox.delete('0', 'end')  # erase entire listbox
-    for song in self.song_list:
-      song_name = song[0][0:len(song[0]) -
-                          4]  # extract the song name from the midi file name
-      song_name = song_name.split("_")
-      self.listbox.insert("end", str(song[-1]) + ". " + " ".join(song_name))
-    self.listbox.insert("end", "")
-    self.listbox.insert("end", "-- Click to add more songs --")
+    self.shown_songs = []
+    self.all_shown = False
+    self.add_page()
+    self.prefetch_around(0)
+
+  def add_page(self):
+    """Adds the next page of songs that match the search to the end of the listbox"""
+    songs = self.catalog.search(self.search_text.get(), len(self.shown_songs),
+                                PAGE_SIZE)
+    for song in songs:
+      self.listbox.insert("end",
+                          str(song[-1]) + ". " + Catalog.get_title(song[0]))
+    self.shown_songs += songs
+    if (len(songs) < PAGE_SIZE):
+      self.all_shown = True
+      self.listbox.insert("end", "")
+      self.listbox.insert("end", "-- Click to add more songs --")
+
+  def listbox_scroll(self, first, last):
+    """Moves the scrollbar with the listbox and adds the next page when the bottom of the listbox is shown"""
+    self.scrollbar.set(first, last)
+    if (float(last) > 0.9 and not self.all_shown):
+      self.add_page()
+
+  def listbox_hover(self, event):
+    """Loads the song under the mouse and its neighbours ahead of time"""
+    self.prefetch_around(self.listbox.nearest(event.y))
+
+  def prefetch_around(self, index):
+    """Loads the song at an index of the listbox first, then the songs next to it"""
+    order = [index]
+    for distance in range(1, PREFETCH_NEIGHBOURS + 1):
+      order += [index + distance, index - distance]
+    self.prefetcher.prefetch([
+      self.shown_songs[i] for i in order if (i >= 0 and i < len(self.shown_songs))
+    ])
 
   def hide(self):
     """hides the song selection box behind the canvas"""
     self.frame.lower()
     self.scrollbar.lower()
     self.listbox.lower()
+    self.search_box.lower()
     self.instructions.lower()
     self.back_button.lower()
+    renderer.tk_canvas.focus_set()  # so typed keys go to the piano instead of the search box
 
   def show(self):
     """displays the song selection box over the canvas for the user to choose a song"""
     self.frame.tkraise()
     self.scrollbar.tkraise()
     self.listbox.tkraise()
+    self.search_box.tkraise()
     self.instructions.tkraise()
     self.back_button.tkraise()
 
   def listbox_select(self, event):
     """handle song selection box based on the selected choice"""
-    selected_song = self.song_list[
-      int(self.listbox.get("anchor")[0]) -
-      1]  # get the index from the song_list to find the song name
+    selection = self.listbox.curselection()
+    if (len(selection) == 0 or selection[0] >= len(self.shown_songs)):
+      return  # nothing selected, or one of the lines after the songs
+    selected_song = self.shown_songs[selection[0]]
     self.hide()
 
     # delete previous turtle drawings
     if (self.song is not None):
       self.song.clear()
 
-    # initialize new song and play
-    self.song = Song(selected_song)
-    self.song.play()
-
-    # when song is finished
-    self.show()
+    # initialize new song and play, show the song selection when the song is finished
+    self.song = Song(selected_song, layout=self.prefetcher.take(selected_song))
+    self.song.play(on_finish=self.show)
 
 
 #############################################################################################################
@@ -185,7 +259,7 @@ class Song_Selection():
 
 def create_painter(x, y):
   """Returns a painter (turtle) object at (x,y)"""
-  painter = turtle.Turtle()
+  painter = renderer.create_painter()
   painter.speed(0)
   painter.hideturtle()
   painter.penup()
@@ -194,10 +268,33 @@ def create_painter(x, y):
   return painter
 
 
+class PainterPool():
+  """Hands out painters to the notes and barlines that are on the window and reuses them once they leave,
+    so the number of turtles depends on how much fits on the window instead of the length of the song"""
+
+  def __init__(self):
+    self.free_painters = []
+
+  def acquire(self):
+    """Returns an unused painter, only creates a new one if all painters are in use"""
+    if (len(self.free_painters) > 0):
+      return self.free_painters.pop()
+    return create_painter(0, 0)
+
+  def release(self, painter):
+    """Erases the painter's drawings and keeps it for the next object that needs one"""
+    painter.clear()
+    painter.pencolor("black")
+    self.free_painters.append(painter)
+
+
+painter_pool = PainterPool()  # shared by every song, replaced by use_renderer()
+
+
 def draw_staff(clef_file):
   """Creates staff and clef
     clef_file is a .gif file"""
-  staff = turtle.Turtle()
+  staff = renderer.create_painter()
   staff.penup()
   staff.goto(-WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - NOTE_DISTANCE * 15)
   staff.pensize(2)
@@ -207,267 +304,573 @@ def draw_staff(clef_file):
     staff.setx(WINDOW_WIDTH / 2)
     staff.penup()
     staff.sety(staff.ycor() + NOTE_DISTANCE * 2)
-  # draw treble clef
+  # draw treble clef, stamped so the turtle doesn't have to be redrawn on every update
   staff.goto(-WINDOW_WIDTH / 2.3, staff.ycor() - NOTE_DISTANCE * 6.75)
-  window.addshape(clef_file)
+  renderer.add_shape(clef_file)
   staff.shape(clef_file)
-  window.update()
+  staff.stamp()
+  staff.hideturtle()
+  renderer.update()
   return staff
 
 
+LETTERS = [('C', 0), ('D', 2), ('E', 4), ('F', 5), ('G', 7), ('A', 9), ('B', 11)]  # (letter, pitch out of 12)
+SHARP_ORDER = "FCGDAEB"  # order that sharps are added to key signatures
+FLAT_ORDER = "BEADGCF"  # order that flats are added to key signatures
+staff_tables = {}  # (number of accidentals, "sharp" or "flat") -> lookup table for all 128 midi numbers
+
+
+def parse_key_signature(key_signature):
+  """Returns (number of accidentals, "sharp" or "flat") from a key signature such as "0 sharps" or "3 flats" """
+  words = key_signature.split()
+  count = int(words[0]) if (len(words) > 0 and words[0].isdigit()) else 0
+  kind = "flat" if "flat" in key_signature else "sharp"
+  return (count, kind)
+
+
+def spell_pitch(pitch_num, count, kind):
+  """Returns (letter, accidental) used to write the midi number in a key with count sharps or flats
+    accidental is the number of half-steps the letter is raised (-1 = flat, 0 = natural, 1 = sharp)"""
+  order = SHARP_ORDER if kind == "sharp" else FLAT_ORDER
+  key_accidental = 1 if kind == "sharp" else -1
+  mod_pitch_num = pitch_num % 12
+  # notes in the key
+  for letter, letter_pitch in LETTERS:
+    accidental = key_accidental if letter in order[:count] else 0
+    if (letter_pitch + accidental) % 12 == mod_pitch_num:
+      return (letter, accidental)
+  # natural notes outside of the key
+  for letter, letter_pitch in LETTERS:
+    if letter_pitch == mod_pitch_num:
+      return (letter, 0)
+  # other accidentals are written as sharps in sharp keys and flats in flat keys
+  for letter, letter_pitch in LETTERS:
+    if (letter_pitch + key_accidental) % 12 == mod_pitch_num:
+      return (letter, key_accidental)
+
+
+def get_staff_table(key_signature):
+  """Returns a list of (y coordinate, needs ledger line, note name) for every midi number
+    tables are only built the first time a key signature is used"""
+  key = parse_key_signature(key_signature)
+  if key not in staff_tables:
+    table = []
+    for pitch_num in range(128):
+      letter, accidental = spell_pitch(pitch_num, *key)
+      natural_pitch_num = pitch_num - accidental  # the natural note on the same staff line or space
+      # account for half-steps on the staff
+      octave = 2 * (natural_pitch_num // 12 - 5)  # uses C4 as octave=0
+      staff_num = natural_pitch_num + octave
+      if natural_pitch_num % 12 < 5:
+        staff_num -= 1
+      # adjust to fit window dimensions
+      y = (WINDOW_HEIGHT / 2 + NOTE_DISTANCE * (staff_num - 91) / 2) - 3
+      ledger = natural_pitch_num <= 60 or natural_pitch_num >= 81  # C4 and below, A5 and above
+      name = letter + {-1: "♭", 0: "", 1: "#"}[accidental]
+      table.append((y, ledger, name))
+    staff_tables[key] = table
+  return staff_tables[key]
+
+
 def get_y(pitch_num, key_signature):
   """Returns the y coordinate based on the midi number"""
-  mod_pitch_num = pitch_num % 12  # gets the note value out of 12 notes (C=0)
-  # account for accidentals
-  if mod_pitch_num in {1, 3, 6, 8, 10}:
-    if "sharp" in key_signature:
-      pitch_num -= 1
-    if "flat" in key_signature:
-      pitch_num += 1
-  # account for half-steps on the staff
-  octave = 2 * (pitch_num // 12 - 5)  # uses C4 as octave=0
-  if mod_pitch_num < 5:
-    pitch_num -= 1
-  if mod_pitch_num > 11:
-    pitch_num += 1
-  pitch_num += octave
-  # adjust to fit window dimensions
-  return (WINDOW_HEIGHT / 2 + NOTE_DISTANCE * (pitch_num - 91) / 2) - 3
-
-
-def get_x(beat, time_signature, type):
+  return get_staff_table(key_signature)[pitch_num][0]
+
+
+def get_x(beat, meter_map, type):
   """Returns the x coordinate based on the absolute time (measured in beats since the start)
-    type must either be "note" or "barline" """
-  distance = WINDOW_WIDTH / 8
-  beat = int(beat + 0.05)  # round beat to an int
-
-  x = -WINDOW_WIDTH / 5  # position of the first beat
-  for previous_beat in range(1, beat + 1):
-    x += distance  # increment distance for every previous note
-    if previous_beat % time_signature[0] == 0:
-      x += distance  # increment distance for every previous barline
+    beat can be fractional or an array of beats, type must either be "note" or "barline"
+    meter_map is the song's TimeMap.MeterMap, which says where the barlines are"""
+  distance = BEAT_DISTANCE
+  rounded = np.round(beat)
+  # remove rounding errors from the midi conversion, fractional beats are kept
+  beat = np.where(abs(beat - rounded) < 0.05, rounded, beat)
+
+  # every previous beat and every previous barline adds one distance to the position of the first beat
+  barlines = meter_map.barlines_through(beat)
+  x = -WINDOW_WIDTH / 5 + distance * (beat + barlines)
   if type == "note":
     return x
   if type == "barline":
     return x - distance  # subtract 1 distance because the distance was originally added to offset for the barline
 
 
-class Song():
-  """Store attributes of the selected song and play the song"""
+class BarlineGrid():
+  """The barlines of a song: one at the end of every measure, then the double barline at the end of the song
+    the barlines are worked out from the song's time signatures when they are needed instead of stored
+    barlines are numbered from 1, the double barline is the last two"""
+
+  def __init__(self, meter_map, total_beats):
+    """total_beats is the length of the song in beats"""
+    self.meter_map = meter_map
+    self.measures = int(meter_map.barlines_through(total_beats))  # barlines before the double barline
+    self.end_beat = total_beats + 1  # beat of the double barline
+    self.last = self.measures + 2
+    # the double barline is checked every frame, so its two x coordinates are worked out once
+    self.end_xs = [
+      float(get_x(self.end_beat + offset, meter_map, "barline"))
+      for offset in (0, .1)
+    ]
+
+  def x(self, index):
+    """Returns the x coordinate of a barline before scrolling"""
+    if (index <= self.measures):
+      # same as get_x(), there are index barlines up to and including this one
+      beat = self.meter_map.barline_beat(index)
+      return -WINDOW_WIDTH / 5 + BEAT_DISTANCE * (beat + index - 1)
+    return self.end_xs[index - self.measures - 1]
+
+  def first_at(self, x):
+    """Returns the number of the first barline at or to the right of x, last + 1 if there is none"""
+    distance = (x + WINDOW_WIDTH / 5) / BEAT_DISTANCE + 1  # undoes get_x() for a barline
+    index = self.meter_map.first_barline_from(distance)
+    if (index <= self.measures):
+      return index
+    for index in range(self.measures + 1, self.last + 1):
+      if (self.x(index) >= x):
+        return index
+    return self.last + 1
+
+  def visible(self, left, right):
+    """Returns the numbers of the barlines with left <= x < right, as a range"""
+    return range(self.first_at(left), self.first_at(right))
+
+
+class Background():
+  """The parts of the window that don't move and are the same for every song:
+    staff, clef, piano keyboard, instructions, title and buttons
+    they are drawn once and each new song is attached to them"""
+
+  def __init__(self):
+    self.song = None
+    self.staff = draw_staff(clef)
 
-  def __init__(self, selected_song):
-    """initialize variables"""
-    # info from csv file
-    self.song_name = selected_song[0][0:len(selected_song[0]) - 4]
+    # piano keyboard for user input
+    self.keyboard = Keyboard()
+
+    # title of the song that is attached
+    self.title = renderer.add_label("", -375, -250, TK_FONT)
+
+    # button to show note letters
+    self.note_name_button = renderer.add_button("Show Note Names", 0, -250,
+                                                15, TK_FONT, "CadetBlue3",
+                                                self.toggle_note_names)
+
+  def attach(self, song):
+    """Makes song the song that the keyboard and buttons control"""
+    self.song = song
+    self.keyboard.song = song
+    self.title.config(text=song.song_name)
+    self.update_note_name_button()
+
+  def detach(self, song):
+    """Stops the keyboard and buttons from controlling song"""
+    if (self.song is song):
+      self.song = None
+      self.keyboard.song = None
+      self.title.config(text="")
+
+  def toggle_note_names(self):
+    """Shows or hides the note names of the attached song"""
+    if (self.song is not None):
+      self.song.toggle_note_names()
+      self.update_note_name_button()
+
+  def update_note_name_button(self):
+    """Changes the button text to what clicking it will do"""
+    text = "Hide Note Names" if self.song.show_names else "Show Note Names"
+    self.note_name_button.config(text=text)
+
+
+background = None  # Background, drawn by get_background()
+
+
+def get_background():
+  """Returns the background, drawing it the first time"""
+  global background
+  if (background is None):
+    background = Background()
+  return background
+
+
+class SongLayout():
+  """The parts of a song that don't draw anything: the notes from the midi file and where they go on the staff
+    can be made on a background thread before the song is chosen"""
+
+  def __init__(self, selected_song, song_data=None):
+    """song_data is (notes_data, tempo_map, meter_map), read from the midi file if not given
+      the key signature is detected from the notes if the song list has "auto" instead of a key signature
+      the time signature in the song list is used unless the midi file changes time signature
+      with the song list's time signature a measure is numerator beats long, the way songs have always been laid out"""
     self.time_signature = selected_song[1]
-    self.pickup = selected_song[2]
     self.key_signature = selected_song[3]
-
-    self.song_name = self.song_name.split("_")
-    self.song_name = " ".join(self.song_name)
-    self.title = tk.Label(tk_canvas.master,
-                          bg="white",
-                          height=1,
-                          font=TK_FONT,
-                          text=self.song_name,
-                          border=0)
-    tk_canvas.create_window(-375, -250, window=self.title)
-
-    # read from the midi file
-    song_file = selected_song[0]
-    self.notes_data, self.tempo = ReadMidi.readMidi(song_file)
-
-    self.notes_list = []
-    self.barlines_list = []
+    if (song_data is None):
+      song_data = SongCache.read_song(selected_song[0])
+    self.notes_data, self.tempo_map, self.meter_map = song_data
+    self.song_list_meter = len(self.meter_map.starts) == 1
+    if (self.song_list_meter):
+      self.meter_map = TimeMap.MeterMap([0], [self.time_signature],
+                                        [self.time_signature[0]])
+    if (self.key_signature in ("", AUTO_KEY)):
+      self.key_signature = KeyDetection.detect_key_signature(self.notes_data)
     self.load_notes()
     self.load_barlines()
+    self.load_speeds()
 
-    self.staff = draw_staff(clef)
+  def load_notes(self):
+    """store the notes in a NoteTable"""
+    self.staff_table = get_staff_table(self.key_signature)
+    pitches = [note[0] for note in self.notes_data]
+    lengths = [note[2] for note in self.notes_data]
+    starts = [note[4] for note in self.notes_data]
+    xs = get_x(np.array(starts, dtype=float), self.meter_map, "note")
+    ys = [self.staff_table[pitch_num][0] for pitch_num in pitches]
+    ledgers = [self.staff_table[pitch_num][1] for pitch_num in pitches]
+    self.notes = NoteTable(pitches, starts, lengths, xs, ys, ledgers)
+    audio.preload(set(pitches))  # so pressing a key doesn't have to synthesize the sound
 
-    # piano keyboard for user input
-    self.keyboard = Keyboard(self.notes_list)
+  def load_barlines(self):
+    """work out where the barlines go, their x coordinates are only calculated when they are on the window"""
+    song_end = max(note[3] for note in self.notes_data)  # time the last note is released
+    total_beats = int(song_end)
+    if (self.song_list_meter):
+      # the length of the song is counted in beats of the time signature's denominator, as it always has been
+      total_beats = int(song_end * (self.time_signature[1] / 4))
+    self.barlines = BarlineGrid(self.meter_map, total_beats)
+
+  def load_speeds(self):
+    """store the scrolling speed in pixels per second from each tempo change, time signature change
+      or shortened measure to the next: the distance between them divided by the time it takes to play
+      every measure takes up one extra beat of distance for the barline, so that distance is spread over the measure"""
+    beats = np.union1d(self.tempo_map.beats, self.meter_map.distance_beats)
+    ends = np.append(beats[1:], beats[-1] + 1)  # the last speed lasts until the end of the song
+    # where each speed starts, measured like get_x() before it is scaled and moved to the window's coordinates
+    self.speed_distances = self.meter_map.distance_at(beats)
+    distances = (self.meter_map.distance_at(ends) -
+                 self.speed_distances) * BEAT_DISTANCE
+    seconds = self.tempo_map.seconds_at(ends) - self.tempo_map.seconds_at(beats)
+    self.speeds = distances / seconds
+
+  def nbytes(self):
+    """Returns about how much memory the layout uses"""
+    return (self.notes.rows.nbytes + self.notes.intervals.members.nbytes +
+            self.tempo_map.beats.nbytes * 3 + self.speeds.nbytes * 2 +
+            200 * len(self.notes_data))
 
-    # button to show note letters
-    self.note_name_button = tk.Button(tk_canvas.master,
-                                      bg="white",
-                                      height=1,
-                                      width=15,
-                                      font=TK_FONT,
-                                      text="Show Note Names",
-                                      border=0,
-                                      activebackground="CadetBlue3",
-                                      command=self.show_note_names)
-    tk_canvas.create_window(0, -250, window=self.note_name_button)
 
-  def load_notes(self):
-    """add notes to the list of notes"""
-    for pitch_num, note_letter, note_length, absolute_time in self.notes_data:
-      note = Note(pitch_num, note_letter, note_length, absolute_time,
-                  self.time_signature, self.key_signature)
-      self.notes_list.append(note)
+class Song():
+  """Store attributes of the selected song and play the song"""
 
-  def load_barlines(self):
-    """add barlines to the list of barlines"""
-    total_beats = int(self.notes_data[-1][-1] * (self.time_signature[1] / 4))
-    for beat in range(total_beats):
-      beat += 1  # beats start at 1
-      if (beat % self.time_signature[0] == 0):
-        barline = Barline(beat, self.time_signature)
-        self.barlines_list.append(barline)
-    # double barline
-    beat += 1
-    barline = Barline(beat, self.time_signature)
-    self.barlines_list.append(barline)
-    barline = Barline(beat + .1, self.time_signature)
-    self.barlines_list.append(barline)
-
-  def show_note_names(self):
-    """shows the note names on the turtle screen, pauses all other actions while note names are shown"""
-    for note in self.notes_list:
-      note.draw_letter()
-    time.sleep(0.5)
-    for note in self.notes_list:
-      note.painter.clear()
-
-  def play(self):
-    """mainloop for moving the note/barline objects"""
-    clock = pygame.time.Clock()
-    while (len(self.barlines_list) > 0 or len(self.notes_list) > 0):
-      for note in self.notes_list:
-        note.update()
-        if (note.x < -WINDOW_WIDTH / 2 + 210):
-          # delete note if reaches far left
-          note.painter.clear()
-          self.notes_list.remove(note)
-        elif (note.x < -WINDOW_WIDTH / 2 + 270 and note.is_played == False):
-          # stop notes from moving if note hasn't been played
-          for note in self.notes_list:
-            note.move_right()
-          # also stop barlines from moving
-          for barline in self.barlines_list:
-            barline.move_right()
-
-      for barline in self.barlines_list:
-        barline.update()
-        if (barline.x < -WINDOW_WIDTH / 2 + 210):
-          barline.painter.clear()
-          self.barlines_list.remove(barline)
-
-      clock.tick(self.tempo)
-      window.update()
+  def __init__(self, selected_song, song_data=None, layout=None):
+    """initialize variables
+      song_data is (notes_data, tempo_map, meter_map), read from the midi file if not given
+      layout is the song's SongLayout if it was already made, it is changed while the song plays"""
+    # info from csv file
+    self.song_name = Catalog.get_title(selected_song[0])
+    self.time_signature = selected_song[1]
+    self.pickup = selected_song[2]
+
+    # read from the midi file and work out the positions of the notes and barlines
+    if (layout is None):
+      layout = SongLayout(selected_song, song_data)
+    self.notes_data = layout.notes_data
+    self.key_signature = layout.key_signature
+    self.tempo_map = layout.tempo_map  # TimeMap.TempoMap
+    self.meter_map = layout.meter_map  # TimeMap.MeterMap
+    self.speed_distances = layout.speed_distances  # where each scrolling speed starts, sorted
+    self.speeds = layout.speeds  # pixels per second
+    self.staff_table = layout.staff_table
+    self.notes = layout.notes  # NoteTable
+    self.barlines = layout.barlines  # BarlineGrid, x coordinates of the barlines before scrolling
+
+    self.playing = False
+    self.visible_notes = {}  # index in the NoteTable -> Note, only for the notes on the window
+    self.show_names = False  # note names are written under the notes
+    self.visible_barlines = {}  # index in the BarlineGrid -> Barline, only for the barlines on the window
+    self.scroll_x = 0.0  # how far the song has scrolled to the right
+    self.frame_count = 0
+    self.latency_label = None
+
+    # staff, keyboard, title and buttons are drawn once and shared by every song
+    self.background = get_background()
+    self.staff = self.background.staff
+    self.keyboard = self.background.keyboard
+    self.background.attach(self)
+    if (show_latency):
+      self.show_latency_overlay()
+
+  def toggle_note_names(self):
+    """shows the note names under the notes if they are hidden and hides them if they are shown
+      only the notes on the window get a name, each name is written once and then moves with its note"""
+    self.show_names = not self.show_names
+    for note in self.visible_notes.values():
+      note.update(self.show_names)
+    renderer.update()  # also shown if the song is waiting for a note or finished
+
+  def show_latency_overlay(self):
+    """Shows the latency of the last presses in the top right corner"""
+    self.latency_label = renderer.add_label(latency.overlay_text(), 280, -270,
+                                            ("Courier", 10))
+
+  def toggle_latency_overlay(self):
+    """Shows the latency overlay if it is hidden and hides it if it is shown"""
+    global show_latency
+    show_latency = not show_latency
+    if (self.latency_label is not None):
+      self.latency_label.destroy()
+      self.latency_label = None
+    if (show_latency):
+      self.show_latency_overlay()
+
+  def update_visible_notes(self):
+    """Creates Note drawings for the rows that are on the window and releases the ones that left"""
+    on_window = self.notes.visible(LEFT_EDGE, RIGHT_EDGE)
+    for index in list(self.visible_notes):
+      if index not in on_window:
+        # delete note if reaches far left
+        self.visible_notes.pop(index).release()
+    for index in on_window:
+      if index not in self.visible_notes:
+        pitch_num = int(self.notes.rows["pitch"][index])
+        self.visible_notes[index] = Note(self.notes, index,
+                                         self.staff_table[pitch_num][2])
+    for note in self.visible_notes.values():
+      note.update(self.show_names)
+
+  def update_visible_barlines(self):
+    """Creates Barline drawings for the barlines that are on the window and releases the ones that left"""
+    on_window = self.barlines.visible(LEFT_EDGE - self.scroll_x,
+                                      RIGHT_EDGE - self.scroll_x)
+    for index in list(self.visible_barlines):
+      if index not in on_window:
+        self.visible_barlines.pop(index).release()
+    for index in on_window:
+      if index not in self.visible_barlines:
+        self.visible_barlines[index] = Barline()
+      self.visible_barlines[index].update(self.barlines.x(index) +
+                                          self.scroll_x)
+
+  def play_note(self, index):
+    """Marks the note at index in the NoteTable as played"""
+    self.notes.play(index)
+    if index in self.visible_notes:
+      self.visible_notes[index].play_note()
+
+  def scroll_speed(self):
+    """Returns the scrolling speed in pixels per second for the tempo and time signature at the stop line"""
+    distance = (STOP_X - self.scroll_x + WINDOW_WIDTH / 5) / BEAT_DISTANCE  # undoes get_x() for a note
+    index = max(int(np.searchsorted(self.speed_distances, distance, "right")) - 1, 0)
+    return float(self.speeds[index])
+
+  def play(self, on_finish=None):
+    """starts moving the note/barline objects
+      frames are scheduled on the Tk event loop, so clicks and buttons are handled between frames
+      on_finish is called when the song is finished"""
+    self.on_finish = on_finish
+    self.scheduler = Scheduler(self.scroll_speed(), TARGET_FPS)
+    self.playing = True
+    midi_input.drain()  # forget keys pressed before the song started
+    if (midi_replay is not None):
+      midi_input.replay_file(*midi_replay)
+    self.frame()
+
+  def frame(self):
+    """moves the note/barline objects for one frame and schedules the next frame"""
+    if (not self.playing):
+      return
+    barlines_left = (self.barlines.x(self.barlines.last) + self.scroll_x >=
+                     LEFT_EDGE)
+    if (not barlines_left and not self.notes.remaining(LEFT_EDGE)):
+      self.playing = False
+      if (self.on_finish is not None):
+        self.on_finish()
+      return
+
+    # midi keys pressed since the last frame
+    for pitch_num, press_time in midi_input.drain():
+      self.keyboard.check_correct(pitch_num, press_time)
+
+    # stop notes and barlines from moving if a note hasn't been played
+    self.scheduler.pixels_per_second = self.scroll_speed()  # the tempo or time signature may have changed
+    distance = min(self.scheduler.advance(renderer.now()),
+                   self.notes.scroll_limit(STOP_X))
+    self.notes.scroll(-distance)
+    self.scroll_x -= distance
+    # only the notes and barlines on the window are touched
+    self.update_visible_notes()
+    self.update_visible_barlines()
+
+    presses = latency.frame_drawn()
+    renderer.update()
+    latency.frame_shown(renderer.now(), presses)
+    self.frame_count += 1
+    if (self.latency_label is not None and
+        self.frame_count % LATENCY_OVERLAY_FRAMES == 0):
+      self.latency_label.config(text=latency.overlay_text())
+    delay = self.scheduler.frame_delay(renderer.now())
+    renderer.on_timer(self.frame, int(delay * 1000))
 
   def clear(self):
     """function to clear all painters and delete the song"""
-    # traverse each list to delete all elements
-    i = len(self.notes_list) - 1
-    while (i >= 0):
-      note = self.notes_list[i]
-      note.painter.clear()
-      self.notes_list.pop()
-      i -= 1
-    i = len(self.barlines_list) - 1
-    while (i >= 0):
-      barline = self.barlines_list[i]
-      barline.painter.clear()
-      self.barlines_list.pop()
-      i -= 1
-    self.title.destroy()
+    self.playing = False  # stops the scheduled frames
+    if (midi_replay is not None):
+      midi_input.stop()
+    for note in self.visible_notes.values():
+      note.release()
+    self.visible_notes = {}
+    for barline in self.visible_barlines.values():
+      barline.release()
+    self.visible_barlines = {}
+    self.background.detach(self)
+    if (self.latency_label is not None):
+      self.latency_label.destroy()
+
+
+def arc_points(x, y, heading, radius, extent, steps):
+  """Returns the points a turtle at (x, y) facing heading passes through while drawing circle(radius, extent)"""
+  # the turtle turns left around a center that is radius away on its left side
+  center_x = x - radius * math.sin(math.radians(heading))
+  center_y = y + radius * math.cos(math.radians(heading))
+  points = []
+  for step in range(steps + 1):
+    angle = math.radians(heading + extent * step / steps)
+    points.append((center_x + radius * math.sin(angle),
+                   center_y - radius * math.cos(angle)))
+  return points
+
+
+def notehead_points():
+  """Returns the outline of a notehead at (0, 0): two wide and two narrow quarter circles, tilted like a real notehead"""
+  points = [(0.0, 0.0)]
+  heading = 150
+  for radius in (10 * NOTE_SIZE, 4 * NOTE_SIZE, 10 * NOTE_SIZE, 4 * NOTE_SIZE):
+    points += arc_points(*points[-1], heading, radius, 90, 8)[1:]
+    heading += 90
+  return tuple(points[:-1])  # the last point is back at the start
+
+
+def rectangle(x1, y1, x2, y2):
+  """Returns the corners of a rectangle"""
+  return ((x1, y1), (x2, y1), (x2, y2), (x1, y2))
+
+
+NOTEHEAD = notehead_points()
+# stem on the right of the notehead and ledger line through it, relative to the note's (x, y)
+STEM = rectangle(NOTE_SIZE * 2 - 0.5, -NOTE_SIZE * 2, NOTE_SIZE * 2 + 0.5,
+                 NOTE_SIZE * 38)
+LEDGER_LINE = rectangle(NOTE_SIZE * 2 + 20 - 30 * NOTE_SIZE,
+                        -NOTE_SIZE * 2 - 8.5, NOTE_SIZE * 2 + 20,
+                        -NOTE_SIZE * 2 - 7.5)
+note_glyphs = set()  # names of the note shapes registered with the renderer
+
+
+def get_note_glyph(length, ledger, color):
+  """Returns the name of the shape for a note, registered with the renderer the first time it is used
+    the shape has the notehead (filled for quarter notes and shorter notes), the stem (except for whole notes)
+    and the ledger line if the note needs one, so a note is drawn with one stamp"""
+  filled = length < 1.01
+  stem = length < 3.99
+  name = "note_%s_%s_%s_%s" % ("filled" if filled else "hollow",
+                               "stem" if stem else "nostem",
+                               "ledger" if ledger else "noledger", color)
+  if name not in note_glyphs:
+    components = [(NOTEHEAD, color if filled else "", color)]
+    if (stem):
+      components.append((STEM, color, color))
+    if (ledger):
+      components.append((LEDGER_LINE, color, color))
+    renderer.add_compound_shape(name, components)
+    note_glyphs.add(name)
+  return name
 
 
 class Note():
-  """Create notes to display on the window. 
-    Notes keep the same y coordinate (based on pitch) and can move left along the window"""
+  """Draws a row of the song's NoteTable while it is on the window. 
+    Notes keep the same y coordinate (based on pitch) and follow the x coordinate in the table"""
 
-  def __init__(self, pitch_num, note_letter, note_length, absolute_time,
-               time_signature, key_signature):
+  def __init__(self, notes, index, note_letter):
     """Initialize note info to variables"""
+    row = notes.rows[index]
+    self.notes = notes
+    self.index = index
     self.letter = note_letter
-    self.length = note_length
-    self.pitch_num = pitch_num
-    self.y = get_y(pitch_num, key_signature)
-    self.x = get_x(absolute_time - note_length, time_signature, "note")
-    self.ledger = True if (pitch_num <= 60 or pitch_num >= 81) else False
-    self.painter = create_painter(self.x, self.y)
-    self.is_played = False
-
-  def oval(self):
-    """Function for drawing noteheads"""
-    self.painter.goto(self.x, self.y)
-    # check if the note should be filled (filled for quarter notes and shorter notes)
-    if (self.length < 1.01):
-      self.painter.fillcolor(self.painter.pencolor())
-      self.painter.begin_fill()
-    # draw the notehead
-    self.painter.pendown()
-    self.painter.setheading(150)
-    self.painter.circle(10 * NOTE_SIZE, 90)
-    self.painter.circle(4 * NOTE_SIZE, 90)
-    self.painter.circle(10 * NOTE_SIZE, 90)
-    self.painter.circle(4 * NOTE_SIZE, 90)
-    self.painter.penup()
-    self.painter.end_fill()
-    self.note_stem()
-
-  def note_stem(self):
-    """Function for drawing stems on noteheads"""
-    self.painter.goto(self.x + NOTE_SIZE * 2, self.y - NOTE_SIZE * 2)
-    # draw the stem unless note is a whole note (4 beats)
-    if (self.length < 3.99):
-      self.painter.pendown()
-      self.painter.setheading(90)
-      self.painter.forward(40 * NOTE_SIZE)
-      self.painter.penup()
-
-  def ledger_line(self):
-    """Function for drawing ledger lines for notes that go off the staff"""
-    self.painter.goto(self.x + NOTE_SIZE * 2 + 20, self.y - NOTE_SIZE * 2 - 8)
-    self.painter.pendown()
-    self.painter.setheading(-180)
-    self.painter.forward(30 * NOTE_SIZE)
-    self.painter.penup()
+    self.length = float(row["length"])
+    self.pitch_num = int(row["pitch"])
+    self.y = float(row["y"])
+    self.x = notes.x(index)
+    self.ledger = bool(row["ledger"])
+    self.painter = painter_pool.acquire()
+    self.is_played = bool(row["played"])
+    self.color = "green" if self.is_played else "black"
+    self.drawn_x = None  # x position of the current drawing (None when the note needs to be redrawn)
+    self.letter_painter = None  # separate painter, so the name can be erased without erasing the note
+    self.letter_x = None  # x position of the written name (None when the name isn't shown)
 
   def draw_letter(self):
     """Function for drawing the letters for notes"""
-    self.painter.goto(self.x + NOTE_SIZE * 2 - 25, self.y - 80)
-    self.painter.color("CadetBlue3")
-    self.painter.pendown()
-    self.painter.write(self.letter, font=TURTLE_FONT, align='center')
-    self.painter.penup()
-    self.painter.color("black")
-
-  def move_left(self):
-    """Set the new x position to the left"""
-    self.x -= 1
-
-  def move_right(self):
-    """Set the new x position to the right"""
-    self.x += 1
-
-  def update(self):
-    """Updates the position of the object
-        Only draws notes if it is on window"""
-    self.move_left()
-    if (self.x < WINDOW_WIDTH / 2 + 50):
-      self.painter.clear()
-      self.oval()
-      self.note_stem()
-      # check if ledger lines are necessary
-      if (self.ledger):
-        self.ledger_line()
+    if (self.letter_painter is None):
+      self.letter_painter = painter_pool.acquire()
+    self.letter_painter.goto(self.x + NOTE_SIZE * 2 - 25, self.y - 80)
+    self.letter_painter.color("CadetBlue3")
+    self.letter_painter.write(self.letter, font=TURTLE_FONT, align='center')
+    self.letter_painter.color("black")
+    self.letter_x = self.x
+
+  def erase_letter(self):
+    """Gives the painter of the name back to the painter pool"""
+    if (self.letter_painter is not None):
+      painter_pool.release(self.letter_painter)
+      self.letter_painter = None
+    self.letter_x = None
+
+  def draw(self):
+    """Draws the note once at its current position by stamping its shape"""
+    self.painter.clear()
+    self.painter.goto(self.x, self.y)
+    self.painter.setheading(90)  # shapes are drawn upright when the painter faces up
+    self.painter.shape(get_note_glyph(self.length, self.ledger, self.color))
+    self.painter.stamp()
+    self.drawn_x = self.x
+
+  def release(self):
+    """Gives the painters back to the painter pool"""
+    if (self.painter is not None):
+      painter_pool.release(self.painter)
+      self.painter = None
+    self.drawn_x = None
+    self.erase_letter()
+
+  def update(self, show_name=False):
+    """Updates the position of the object from the NoteTable and shows or hides its name
+        The note and its name are drawn once, afterwards the drawings are moved instead of redrawn"""
+    self.x = self.notes.x(self.index)
+    if (self.drawn_x is None):
+      self.draw()
+    elif (self.drawn_x != self.x):
+      renderer.shift(self.painter, self.x - self.drawn_x)
+      self.drawn_x = self.x
+    if (not show_name):
+      self.erase_letter()
+    elif (self.letter_x is None):
+      self.draw_letter()
+    elif (self.letter_x != self.x):
+      renderer.shift(self.letter_painter, self.x - self.letter_x)
+      self.letter_x = self.x
 
   def play_note(self):
-    self.painter.pencolor("green")
+    self.color = "green"
+    self.drawn_x = None  # redraw in the new color
     self.is_played = True
-    # play the sounds
 
 
 class Barline():
-  """Create notes to display on the window."""
+  """Draws a barline while it is on the window"""
 
-  def __init__(self, beat, time_signature):
-    self.x = get_x(beat, time_signature, "barline")
+  def __init__(self):
+    self.x = None
     self.y = WINDOW_HEIGHT / 2 - NOTE_DISTANCE * 15
-    self.painter = create_painter(self.x, self.y)
+    self.painter = painter_pool.acquire()
+    self.drawn_x = None  # x position of the current drawing (None when the barline needs to be drawn)
 
   def draw_barline(self):
     """Function for drawing barlines"""
@@ -476,22 +879,24 @@ class Barline():
     self.painter.setheading(90)
     self.painter.forward(NOTE_DISTANCE * 8)
     self.painter.penup()
-
-  def move_left(self):
-    """Set the new x position to the left"""
-    self.x -= 1
-
-  def move_right(self):
-    """Set the new x position to the right"""
-    self.x += 1
-
-  def update(self):
-    """Updates the position of the barline
-        Only draws barlines if it is on window"""
-    self.move_left()
-    if (self.x < WINDOW_WIDTH / 2 + 50):
-      self.painter.clear()
+    self.drawn_x = self.x
+
+  def release(self):
+    """Gives the painter back to the painter pool"""
+    if (self.painter is not None):
+      painter_pool.release(self.painter)
+      self.painter = None
+    self.drawn_x = None
+
+  def update(self, x):
+    """Moves the barline to x
+        The barline is drawn once, afterwards the drawing is moved instead of redrawn"""
+    self.x = float(x)
+    if (self.drawn_x is None):
       self.draw_barline()
+    elif (self.drawn_x != self.x):
+      renderer.shift(self.painter, self.x - self.drawn_x)
+      self.drawn_x = self.x
 
 
 #############################################################################################################
@@ -500,28 +905,37 @@ class Barline():
 
 
 class Keyboard():
-  """Displays a piano keyboard and listens for user input (clicking on a piano key)"""
+  """Displays a piano keyboard and listens for user input (clicking on a piano key)
+    the keys play the notes of the song that is attached to the background"""
 
-  def __init__(self, notes_list):
+  def __init__(self):
     # create keyboard
     self.keyboard = create_painter(-450, -100)
     self.keyboard.pendown()
-    self.keyboard.write("Click keys on the piano to play notes: ",
-                        font=('Times', 15))
+    self.keyboard.write(
+      "Click keys on the piano or type on the A to ' keys to play notes: ",
+      font=('Times', 15))
     self.keyboard.penup()
     self.keyboard.goto(0, -187)
-    self.keyboard.showturtle()
-    window.addshape(keyboard_pic)
+    renderer.add_shape(keyboard_pic)
     self.keyboard.shape(keyboard_pic)
+    self.keyboard.stamp()
 
-    self.notes_list = notes_list
-    window.onscreenclick(self.click)
+    self.song = None  # set by Background.attach()
+    self.key_table = get_key_table(self.get_pitch_num)
+    renderer.on_click(self.click)
+    for key, pitch_num in KEY_BINDINGS.items():
+      renderer.on_key(lambda pitch_num=pitch_num: self.check_correct(pitch_num),
+                      key)
+    renderer.on_key(self.toggle_latency_overlay, LATENCY_OVERLAY_KEY)
+    renderer.on_key(self.save_latency, LATENCY_SAVE_KEY)
 
   def click(self, x, y):
     """Called when user presses on screen. Plays the note chosen on the keyboard"""
     if (y > -250 and y < -115):
-      pitch_num = self.get_pitch_num(x, y)
-      self.check_correct(pitch_num)
+      column = int(x + WINDOW_WIDTH / 2)
+      if (column >= 0 and column < WINDOW_WIDTH):
+        self.check_correct(int(self.key_table[int(y > -210), column]))
 
   def get_pitch_num(self, x, y):
     """Returns the pitch num based on the location that was clicked"""
@@ -543,17 +957,78 @@ class Keyboard():
     pitch_num = int(60 + interval + (octave * 12))
     return pitch_num
 
-  def check_correct(self, pitch_num):
-    current_note = self.notes_list[0]
-    if pitch_num == current_note.pitch_num:
-      current_note.play_note()
+  def check_correct(self, pitch_num, input_time=None):
+    """Plays the sound of the key and plays a note of the current chord if the pitch is correct
+      input_time is when the key was pressed (renderer.now()), the time of the call if not given"""
+    if (input_time is None):
+      input_time = renderer.now()
+    audio.note_on(pitch_num)
+    if (self.song is None):
+      return
+    notes = self.song.notes
+    # any note of the current chord can be played
+    for index in notes.current_chord(LEFT_EDGE):
+      if pitch_num == notes.rows["pitch"][index]:
+        self.song.play_note(int(index))
+        latency.note_played(input_time, renderer.now())
+        break
+
+  def toggle_latency_overlay(self):
+    """Shows or hides the latency overlay of the attached song"""
+    if (self.song is not None):
+      self.song.toggle_latency_overlay()
+
+  def save_latency(self):
+    """Saves the latency of the last presses as a .json and a .csv file"""
+    latency.write_json(LATENCY_FILE + ".json")
+    latency.write_csv(LATENCY_FILE + ".csv")
+
+
+key_table = None  # built by get_key_table()
+
+
+def get_key_table(get_pitch_num):
+  """Returns the midi number for every pixel column of the window as a numpy array
+    row 0 is the bottom of the keyboard (white keys only), row 1 is the top where the black keys are
+    the table is built once with get_pitch_num(x, y), so a click only needs one lookup"""
+  global key_table
+  if (key_table is None):
+    key_table = np.zeros((2, WINDOW_WIDTH), dtype=np.uint8)
+    for column in range(WINDOW_WIDTH):
+      x = column - WINDOW_WIDTH / 2
+      key_table[0, column] = get_pitch_num(x, -230)
+      key_table[1, column] = get_pitch_num(x, -150)
+  return key_table
 
 
 #############################################################################################################
 #   Run Program
 #############################################################################################################
 if __name__ == "__main__":
-  song_selection = Song_Selection(window, CSV_FILE)
-
-  window.listen()
-  window.mainloop()
+  parser = argparse.ArgumentParser(description="Practice songs on a piano")
+  parser.add_argument("--midi-port",
+                      nargs="?",
+                      const="",
+                      help="play with a midi keyboard (the default port if no name is given)")
+  parser.add_argument("--midi-file",
+                      help="play back a .mid file as midi input when a song starts")
+  parser.add_argument("--speed",
+                      type=float,
+                      default=1,
+                      help="playback speed of --midi-file")
+  args = parser.parse_args()
+
+  use_renderer(Render.TurtleRenderer(WINDOW_WIDTH, WINDOW_HEIGHT, "Music App"))
+  audio.start_output()
+  # the computer keys first, then every midi number (which includes the keys of the drawn keyboard),
+  # so no key press has to synthesize a sound
+  audio.preload_in_background(
+    list(KEY_BINDINGS.values()) + list(Audio.MIDI_PITCHES))
+  if (args.midi_port is not None):
+    if (not midi_input.open_port(args.midi_port or None)):
+      print("could not open the midi port, is python-rtmidi installed?")
+  if (args.midi_file is not None):
+    midi_replay = (args.midi_file, args.speed)
+  song_selection = Song_Selection(renderer.window, CSV_FILE)
+
+  renderer.mainloop()
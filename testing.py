@@ -0,0 +1,668 @@
+# Tests for the parts of the app that don't need a display
+#   python3 -m unittest testing
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import unittest
+import mido
+import numpy as np
+import Audio
+import Benchmark
+import Catalog
+import Ingest
+import KeyDetection
+import Latency
+import ReadMidi
+import Render
+import SongCache
+import TimeMap
+import main
+from NoteTable import IntervalIndex, NoteTable
+
+
+def make_song_data(notes):
+  """Returns song data for (midi number, start beat, length) notes at 120 bpm in 4/4"""
+  notes_data = [(pitch_num, ReadMidi.get_pitch(pitch_num), length,
+                 start + length, start) for pitch_num, start, length in notes]
+  return (notes_data, TimeMap.TempoMap([0], [120]),
+          TimeMap.MeterMap([0], [(4, 4)]))
+
+
+def play_song(song_data, max_frames=10000):
+  """Plays a song on a RecordingRenderer, pressing every note once it stops, and returns the song"""
+  main.use_renderer(Render.RecordingRenderer())
+  song = main.Song(["Test.mid", [4, 4], 0, "0 sharps", 0], song_data=song_data)
+  song.play()
+  frames = 0
+  while (song.playing and frames < max_frames):
+    Benchmark.play_current_note(song)
+    main.renderer.run_next_timer()
+    frames += 1
+  song.clear()
+  return song
+
+
+def loop_get_x(beat, time_signature, type):
+  """get_x() as it was before the closed form: one step per earlier beat and barline, whole beats only"""
+  distance = main.WINDOW_WIDTH / 8
+  beat = int(beat + 0.05)  # round beat to an int
+
+  x = -main.WINDOW_WIDTH / 5  # position of the first beat
+  for previous_beat in range(1, beat + 1):
+    x += distance  # increment distance for every previous note
+    if previous_beat % time_signature[0] == 0:
+      x += distance  # increment distance for every previous barline
+  if type == "note":
+    return x
+  if type == "barline":
+    return x - distance
+
+
+class LayoutTests(unittest.TestCase):
+
+  def test_get_x_matches_the_loop(self):
+    for time_signature in ([4, 4], [3, 4], [5, 4], [6, 8], [3, 8], [2, 2]):
+      # laid out like a song with the song list's time signature (see SongLayout)
+      meter_map = TimeMap.MeterMap([0], [time_signature], [time_signature[0]])
+      for beat in list(range(400)) + [999, 1000, 2999, 3000]:
+        # near-integer beats from the midi conversion land on the same beat
+        for offset in (-0.04, 0, 0.04):
+          for type in ("note", "barline"):
+            self.assertAlmostEqual(
+              float(main.get_x(beat + offset, meter_map, type)),
+              loop_get_x(beat + offset, time_signature, type),
+              msg=(time_signature, beat + offset, type))
+
+  def test_get_x_of_an_array_matches_single_beats(self):
+    meter_map = TimeMap.MeterMap([0], [(3, 4)])
+    beats = np.array([0, 0.5, 1.98, 2.5, 3, 7.25])
+    self.assertEqual(main.get_x(beats, meter_map, "note").tolist(),
+                     [float(main.get_x(beat, meter_map, "note")) for beat in beats])
+
+
+def original_get_y(pitch_num, key_signature):
+  """get_y() as it was before the staff tables"""
+  mod_pitch_num = pitch_num % 12  # gets the note value out of 12 notes (C=0)
+  # account for accidentals
+  if mod_pitch_num in {1, 3, 6, 8, 10}:
+    if "sharp" in key_signature:
+      pitch_num -= 1
+    if "flat" in key_signature:
+      pitch_num += 1
+  # account for half-steps on the staff
+  octave = 2 * (pitch_num // 12 - 5)  # uses C4 as octave=0
+  if mod_pitch_num < 5:
+    pitch_num -= 1
+  if mod_pitch_num > 11:
+    pitch_num += 1
+  pitch_num += octave
+  # adjust to fit window dimensions
+  return (main.WINDOW_HEIGHT / 2 + main.NOTE_DISTANCE * (pitch_num - 91) / 2) - 3
+
+
+class StaffTableTests(unittest.TestCase):
+
+  def test_c_major_matches_the_original_get_y(self):
+    table = main.get_staff_table("0 sharps")
+    self.assertEqual(len(table), 128)
+    for pitch_num in range(128):
+      self.assertAlmostEqual(table[pitch_num][0],
+                             original_get_y(pitch_num, "0 sharps"),
+                             msg=pitch_num)
+
+  def test_c_major_ledger_lines(self):
+    table = main.get_staff_table("0 sharps")
+    for pitch_num in range(128):
+      # the original test was on the midi number: C4 and below, A5 and above
+      # C#4 is drawn on the C4 position, so it now gets C4's ledger line
+      expected = pitch_num <= 60 or pitch_num >= 81 or pitch_num == 61
+      self.assertEqual(table[pitch_num][1], expected, pitch_num)
+
+  def test_pitches_are_spelled_for_the_key(self):
+    self.assertEqual(main.get_staff_table("7 sharps")[60][2], "B#")
+    self.assertEqual(main.get_staff_table("6 flats")[71][2], "C♭")
+    self.assertEqual(main.get_staff_table("0 sharps")[61][2], "C#")
+    self.assertEqual(main.get_staff_table("2 flats")[61][2], "D♭")
+    # B# is drawn one staff step below C, C flat one step above B
+    self.assertEqual(main.get_staff_table("7 sharps")[60][0],
+                     main.get_staff_table("0 sharps")[59][0])
+    self.assertEqual(main.get_staff_table("6 flats")[71][0],
+                     main.get_staff_table("0 sharps")[72][0])
+
+
+class BarlineGridTests(unittest.TestCase):
+
+  def test_barlines_match_the_original_list(self):
+    song_data = Benchmark.synthetic_song(200)
+    song_end = max(note[3] for note in song_data[0])
+    for time_signature in ([4, 4], [3, 4], [5, 4], [6, 8], [3, 8], [2, 2]):
+      layout = main.SongLayout(["Test.mid", time_signature, 0, "0 sharps", 0],
+                               song_data)
+      grid = layout.barlines
+      # the barlines the original load_barlines() made, one per measure then the double barline
+      total_beats = int(song_end * (time_signature[1] / 4))
+      beats = [
+        beat for beat in range(1, total_beats + 1)
+        if (beat % time_signature[0] == 0)
+      ]
+      expected = [loop_get_x(beat, time_signature, "barline") for beat in beats]
+      expected.append(loop_get_x(total_beats + 1, time_signature, "barline"))
+      expected.append(
+        float(main.get_x(total_beats + 1.1, layout.meter_map, "barline")))
+      self.assertEqual(grid.last, len(expected))
+      for index in range(1, grid.last + 1):
+        self.assertAlmostEqual(grid.x(index), expected[index - 1],
+                               msg=(time_signature, index))
+
+  def test_visible_matches_a_scan_of_every_barline(self):
+    rng = random.Random(0)
+    meter_maps = [
+      TimeMap.MeterMap([0], [(4, 4)]),
+      TimeMap.MeterMap([0], [(3, 8)]),
+      TimeMap.MeterMap([0, 10, 16, 21], [(4, 4), (3, 4), (5, 4), (2, 2)])
+    ]
+    for meter_map in meter_maps:
+      grid = main.BarlineGrid(meter_map, 60)
+      xs = [grid.x(index) for index in range(1, grid.last + 1)]
+      self.assertEqual(xs, sorted(xs))
+      for _ in range(2000):
+        left = rng.uniform(xs[0] - 1000, xs[-1] + 500)
+        right = left + rng.uniform(0, 2000)
+        expected = [
+          index for index in range(1, grid.last + 1)
+          if (left <= xs[index - 1] < right)
+        ]
+        self.assertEqual(list(grid.visible(left, right)), expected)
+      # edges that fall exactly on a barline
+      for index in range(1, grid.last + 1):
+        self.assertEqual(grid.first_at(xs[index - 1]), index)
+
+
+@unittest.skipIf(Audio.pygame is None, "pygame isn't installed")
+class AudioTests(unittest.TestCase):
+
+  def setUp(self):
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")  # a mixer that plays to nowhere
+
+  def tearDown(self):
+    Audio.pygame.mixer.quit()
+
+  def test_output_thread_keeps_playing_blocks(self):
+    engine = Audio.AudioEngine()
+    if (not engine.start_output()):
+      self.skipTest("no audio driver")
+    engine.note_on(60)
+    time.sleep(0.3)
+    engine.stop_output()
+    engine.output_thread.join(1)
+    # the key press got mixed into a block, and blocks kept coming after it
+    self.assertEqual(len(engine.latencies), 1)
+    self.assertGreater(engine.ring_position, 2 * Audio.BUFFER_SIZE)
+    self.assertGreater(np.abs(engine.recording()).max(), 0)
+
+
+class PressDuringUpdateRenderer(Render.RecordingRenderer):
+  """A RecordingRenderer that handles a key press while a frame is sent to the window, like Tk's update() does"""
+
+  def __init__(self):
+    super().__init__()
+    self.press_on_update = False
+
+  def update(self):
+    super().update()
+    if (self.press_on_update):
+      self.press_on_update = False
+      main.latency.note_played(self.now(), self.now())
+
+
+class LatencyTests(unittest.TestCase):
+
+  def test_press_handled_during_update_is_shown_by_the_next_frame(self):
+    test_renderer = PressDuringUpdateRenderer()
+    main.use_renderer(test_renderer)
+    main.latency = Latency.LatencyMonitor()
+    song = main.Song(["Test.mid", [4, 4], 0, "0 sharps", 0],
+                     song_data=make_song_data([(60, 0, 4)]))
+    song.play()
+    test_renderer.press_on_update = True
+    test_renderer.run_next_timer()
+    self.assertEqual(main.latency.count, 0)  # the frame was drawn before the press
+    test_renderer.run_next_timer()
+    self.assertEqual(main.latency.count, 1)
+    # shown when the next frame was sent, not when the press was handled
+    self.assertGreater(main.latency.latencies()[1][0], 0)
+    song.clear()
+
+
+class IntervalTests(unittest.TestCase):
+
+  def test_matches_a_scan_of_every_interval(self):
+    starts = [0, 0, 0.5, 1, 1, 2.5, 3, 3, 7]
+    ends = [1, 4, 1.5, 2, 1, 3, 3, 5, 8]
+    index = IntervalIndex(starts, ends)
+    for step in range(0, 90):
+      time = step / 10
+      expected = [
+        i for i in range(len(starts))
+        if (starts[i] <= time < ends[i] or starts[i] == time)
+      ]
+      self.assertEqual(index.at(time).tolist(), expected, time)
+
+  def test_note_of_length_0_is_in_its_own_chord(self):
+    # C, a grace note D that is released on the tick it is pressed, then E
+    notes = NoteTable([60, 62, 64], [0, 1, 1], [1, 0, 1], [0, 100, 100],
+                      [0, 0, 0], [False] * 3)
+    notes.play(0)
+    self.assertEqual(notes.current_chord(-1000).tolist(), [1, 2])
+
+  def test_chord_of_different_lengths_after_the_first_tick(self):
+    # C and E start together on tick 40 and are released on ticks 80 and 120
+    with tempfile.TemporaryDirectory() as directory:
+      file_name = os.path.join(directory, "Chord.mid")
+      midi_file = mido.MidiFile(ticks_per_beat=480)
+      midi_file.tracks.append(
+        mido.MidiTrack([
+          mido.Message("note_on", note=60, velocity=64, time=40),
+          mido.Message("note_on", note=64, velocity=64, time=0),
+          mido.Message("note_off", note=60, time=40),
+          mido.Message("note_off", note=64, time=40)
+        ]))
+      midi_file.save(file_name)
+      song_data = ReadMidi.readMidi(file_name)
+    layout = main.SongLayout(["Chord.mid", [4, 4], 0, "0 sharps", 0],
+                             song_data)
+    self.assertEqual(layout.notes.current_chord(-1000).tolist(), [0, 1])
+
+  def test_song_with_a_grace_note_can_be_played_to_the_end(self):
+    song = play_song(make_song_data([(60, 0, 1), (62, 1, 0), (64, 1, 1)]))
+    self.assertTrue(song.notes.rows["played"].all())
+    self.assertFalse(song.playing)
+
+
+def make_midi_file(messages, ticks_per_beat=480):
+  """Returns a one-track mido.MidiFile with the given messages"""
+  midi_file = mido.MidiFile(ticks_per_beat=ticks_per_beat)
+  midi_file.tracks.append(mido.MidiTrack(messages))
+  return midi_file
+
+
+class ReadMidiTests(unittest.TestCase):
+
+  def test_note_on_with_velocity_0_is_a_release(self):
+    midi_file = make_midi_file([
+      mido.Message("note_on", note=60, velocity=64),
+      mido.Message("note_on", note=60, velocity=0, time=480),
+      mido.Message("note_on", note=62, velocity=64, time=240),
+      mido.Message("note_off", note=62, time=960)
+    ])
+    notes = ReadMidi.extract_events(midi_file)[2]
+    self.assertEqual(notes, [(60, "C", 1.0, 1.0, 0.0),
+                             (62, "D", 2.0, 3.5, 1.5)])
+
+  def test_overlapping_notes_of_one_pitch_are_paired_in_order(self):
+    # the second C starts before the first is released, the first release ends the first C
+    midi_file = make_midi_file([
+      mido.Message("note_on", note=60, velocity=64),
+      mido.Message("note_on", note=60, velocity=64, time=480),
+      mido.Message("note_off", note=60, time=480),
+      mido.Message("note_off", note=60, time=960)
+    ])
+    notes = ReadMidi.extract_events(midi_file)[2]
+    self.assertEqual(notes, [(60, "C", 2.0, 2.0, 0.0),
+                             (60, "C", 3.0, 4.0, 1.0)])
+
+  def test_tempo_and_time_signature_changes(self):
+    midi_file = make_midi_file([
+      mido.MetaMessage("set_tempo", tempo=600000),
+      mido.MetaMessage("time_signature", numerator=3, denominator=4),
+      mido.Message("note_on", note=60, velocity=64),
+      mido.MetaMessage("set_tempo", tempo=400000, time=960),
+      mido.Message("note_off", note=60, time=480)
+    ])
+    tempo_map, meter_map, notes = ReadMidi.extract_events(midi_file)
+    self.assertEqual(tempo_map.beats.tolist(), [0, 2])
+    np.testing.assert_allclose(tempo_map.bpms, [100, 150])
+    self.assertEqual(meter_map.signature_at(5), (3, 4))
+    self.assertEqual(notes, [(60, "C", 3.0, 3.0, 0.0)])
+
+
+class SongCacheTests(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.cache_dir = SongCache.CACHE_DIR
+    SongCache.CACHE_DIR = os.path.join(self.directory.name, "cache")
+    self.song_data = (make_song_data([(60, 0, 1), (64, 0, 2), (67, 1.5, 0.5)])[0],
+                      TimeMap.TempoMap([0, 4], [90, 120]),
+                      TimeMap.MeterMap([0, 6], [(3, 4), (6, 8)]))
+
+  def tearDown(self):
+    SongCache.CACHE_DIR = self.cache_dir
+    self.directory.cleanup()
+
+  def entry_path(self, name):
+    return os.path.join(SongCache.CACHE_DIR, name + ".npz")
+
+  def test_entry_reads_back_the_saved_song(self):
+    SongCache.save_entry(self.entry_path("song"), *self.song_data)
+    notes_data, tempo_map, meter_map = SongCache.load_entry(
+      self.entry_path("song"))
+    self.assertEqual(notes_data, self.song_data[0])
+    self.assertEqual(tempo_map.beats.tolist(), [0, 4])
+    self.assertEqual(tempo_map.bpms.tolist(), [90, 120])
+    self.assertEqual(meter_map.starts.tolist(), [0, 6])
+    self.assertEqual(meter_map.signatures.tolist(), [[3, 4], [6, 8]])
+
+  def test_entry_of_another_version_is_parsed_again(self):
+    SongCache.save_entry(self.entry_path("song"), *self.song_data)
+    cache_version = SongCache.CACHE_VERSION
+    SongCache.CACHE_VERSION += 1
+    try:
+      self.assertIsNone(SongCache.load_entry(self.entry_path("song")))
+    finally:
+      SongCache.CACHE_VERSION = cache_version
+    self.assertIsNone(SongCache.load_entry(self.entry_path("missing")))
+
+  def test_evict_deletes_the_least_recently_used_entries(self):
+    for age, name in enumerate(("newest", "middle", "oldest")):
+      path = self.entry_path(name)
+      SongCache.save_entry(path, *self.song_data, evict_entries=False)
+      modified = time.time() - 100 * (age + 1)
+      os.utime(path, (modified, modified))
+    entry_bytes = os.path.getsize(self.entry_path("newest"))
+    SongCache.evict(2 * entry_bytes)
+    self.assertEqual(sorted(os.listdir(SongCache.CACHE_DIR)),
+                     ["middle.npz", "newest.npz"])
+    # reading an entry marks it as recently used
+    SongCache.load_entry(self.entry_path("middle"))
+    SongCache.evict(entry_bytes)
+    self.assertEqual(os.listdir(SongCache.CACHE_DIR), ["middle.npz"])
+
+
+class CatalogTests(unittest.TestCase):
+
+  def make_catalog(self, file_names):
+    """Returns a catalog in memory with the songs of a csv file that lists file_names"""
+    with tempfile.TemporaryDirectory() as directory:
+      csv_file = os.path.join(directory, "MidiFiles.csv")
+      with open(csv_file, "w") as file_obj:
+        file_obj.write(Ingest.CSV_HEADER + "\n")
+        for file_name in file_names:
+          file_obj.write(file_name + ", 4/4, 0, 0 sharps\n")
+      catalog = Catalog.Catalog(":memory:")
+      catalog.import_csv(csv_file)
+    self.addCleanup(catalog.close)
+    return catalog
+
+  def titles(self, songs):
+    return [Catalog.get_title(song[0]) for song in songs]
+
+  def test_titles_that_start_with_the_text_come_first(self):
+    catalog = self.make_catalog([
+      "Twinkle_Twinkle.mid", "Jingle_Bells.mid", "Bells_of_Notre_Dame.mid",
+      "Wedding_Bells.mid", "Brother_John.mid"
+    ])
+    self.assertEqual(self.titles(catalog.search("bells")),
+                     ["Bells of Notre Dame", "Jingle Bells", "Wedding Bells"])
+    self.assertEqual(self.titles(catalog.search("TWIN")), ["Twinkle Twinkle"])
+    self.assertEqual(catalog.search("")[4],
+                     ["Brother_John.mid", [4, 4], 0, "0 sharps", 5])
+
+  def test_wildcards_in_the_text_are_matched_literally(self):
+    catalog = self.make_catalog(
+      ["100%_Pure.mid", "1000_Miles.mid", "A_Minor.mid", "Ab_Minor.mid"])
+    self.assertEqual(self.titles(catalog.search("100%")), ["100% Pure"])
+    self.assertEqual(self.titles(catalog.search("a_")), [])
+    self.assertEqual(self.titles(catalog.search("a m")), ["A Minor"])
+
+  def test_file_listed_twice_is_imported_like_read_csv(self):
+    file_names = ["Twinkle_Twinkle.mid", "Brother_John.mid", "Twinkle_Twinkle.mid"]
+    catalog = self.make_catalog(file_names)
+    self.assertEqual([song[0] for song in catalog.search("")], file_names)
+    self.assertEqual([song[4] for song in catalog.search("twinkle")], [1, 3])
+
+  def test_catalog_with_an_older_schema_is_filled_again(self):
+    with tempfile.TemporaryDirectory() as directory:
+      db_file = os.path.join(directory, "songs.db")
+      connection = sqlite3.connect(db_file)
+      connection.executescript("""
+        CREATE TABLE songs (song_number INTEGER PRIMARY KEY, file_name TEXT UNIQUE NOT NULL);
+        CREATE TABLE sources (file_name TEXT PRIMARY KEY, modified REAL);
+      """)
+      connection.close()
+      catalog = Catalog.Catalog(db_file)
+      self.assertEqual(catalog.search(""), [])
+      catalog.close()
+
+  def test_pages_of_songs(self):
+    file_names = ["Song_%03d.mid" % number for number in range(1, 121)]
+    catalog = self.make_catalog(file_names)
+    pages = [catalog.search("song", offset, 50) for offset in (0, 50, 100)]
+    self.assertEqual([len(page) for page in pages], [50, 50, 20])
+    self.assertEqual([song[0] for page in pages for song in page], file_names)
+    self.assertEqual(catalog.search("", 118, 50)[0][4], 119)
+    self.assertEqual(catalog.search("song", 200), [])
+
+
+MAJOR_SCALE = [0, 2, 4, 5, 7, 9, 11, 12]
+HARMONIC_MINOR_SCALE = [0, 2, 3, 5, 7, 8, 11, 12]
+
+
+def scale_notes(tonic, steps):
+  """Returns song data notes for a scale up from a tonic pitch class, the tonic held for 4 beats and the fifth for 2"""
+  notes = []
+  for step in steps:
+    length = {0: 4, 7: 2, 12: 4}.get(step, 1)
+    notes.append((60 + tonic + step, sum(note[2] for note in notes), length))
+  return make_song_data(notes)[0]
+
+
+class KeyDetectionTests(unittest.TestCase):
+
+  def test_every_major_and_minor_scale(self):
+    for mode, steps in (("major", MAJOR_SCALE), ("minor", HARMONIC_MINOR_SCALE)):
+      for tonic in range(12):
+        self.assertEqual(KeyDetection.detect_key(scale_notes(tonic, steps)),
+                         (tonic, mode))
+
+  def test_key_signatures(self):
+    expected = [
+      (0, MAJOR_SCALE, "0 sharps"),  # C major
+      (2, MAJOR_SCALE, "2 sharps"),  # D major
+      (5, MAJOR_SCALE, "1 flats"),  # F major
+      (6, MAJOR_SCALE, "6 sharps"),  # F# major
+      (9, HARMONIC_MINOR_SCALE, "0 sharps"),  # A minor
+      (11, HARMONIC_MINOR_SCALE, "2 sharps"),  # B minor
+      (0, HARMONIC_MINOR_SCALE, "3 flats"),  # C minor
+    ]
+    for tonic, steps, key_signature in expected:
+      self.assertEqual(
+        KeyDetection.detect_key_signature(scale_notes(tonic, steps)),
+        key_signature)
+
+  def test_no_notes_is_c_major(self):
+    self.assertEqual(KeyDetection.detect_key([]), (0, "major"))
+
+
+class IngestTests(unittest.TestCase):
+
+  def test_file_without_notes_is_skipped(self):
+    with tempfile.TemporaryDirectory() as directory:
+      file_name = os.path.join(directory, "Tempo_Only.mid")
+      midi_file = mido.MidiFile()
+      midi_file.tracks.append(
+        mido.MidiTrack([mido.MetaMessage("set_tempo", tempo=400000)]))
+      midi_file.save(file_name)
+      self.assertEqual(Ingest.analyse(file_name), file_name + ": no notes")
+
+  def test_pickup_is_the_silence_before_the_first_note(self):
+    self.assertEqual(Ingest.get_pickup(make_song_data([(60, 0, 1)])[0], [4, 4]), 0)
+    self.assertEqual(Ingest.get_pickup(make_song_data([(60, 2, 1)])[0], [4, 4]), 2)
+    self.assertEqual(Ingest.get_pickup(make_song_data([(60, 1.5, 1)])[0], [6, 8]), 3)
+    # a song that starts with a one beat rest can't be told apart from a pickup of 3 beats
+    self.assertEqual(Ingest.get_pickup(make_song_data([(60, 1, 1)])[0], [4, 4]), 3)
+
+  def test_title_of_a_midi_file_in_a_subdirectory(self):
+    main.use_renderer(Render.RecordingRenderer())
+    song = main.Song(["lib/Empty_Song.midi", [4, 4], 0, "0 sharps", 0],
+                     song_data=make_song_data([(60, 0, 1)]))
+    self.assertEqual(song.song_name, "Empty Song")
+    song.clear()
+
+
+
+def arrival_times(song, beats, step=1e-4):
+  """Returns the seconds after the song starts at which the stop line reaches each beat of a sorted list
+    by scrolling the song in small steps at its scroll speed"""
+  xs = get_x_values(song, beats)
+  song.scroll_x = main.STOP_X - xs[0]
+  times = []
+  time = 0.0
+  while (len(times) < len(xs)):
+    while (len(times) < len(xs) and
+           main.STOP_X - song.scroll_x >= xs[len(times)] - 1e-9):
+      times.append(time)
+    song.scroll_x -= song.scroll_speed() * step
+    time += step
+  return np.array(times)
+
+
+def get_x_values(song, beats):
+  """Returns the x coordinates of notes at the given beats, before scrolling"""
+  return main.get_x(np.array(beats, dtype=float), song.meter_map, "note")
+
+
+class TimeMapTests(unittest.TestCase):
+
+  def make_song(self, tempo_map, meter_map, time_signature=(4, 4)):
+    """time_signature is the one in the song list, used if meter_map has only one"""
+    main.use_renderer(Render.RecordingRenderer())
+    notes_data = [(60, "C", 1, beat + 1, beat) for beat in range(40)]
+    return main.Song(["Test.mid", list(time_signature), 0, "0 sharps", 0],
+                     song_data=(notes_data, tempo_map, meter_map))
+
+  def test_seconds_match_midi_playback(self):
+    ticks_per_beat = 480
+    with tempfile.TemporaryDirectory() as directory:
+      file_name = os.path.join(directory, "Ritardando.mid")
+      midi_file = mido.MidiFile(ticks_per_beat=ticks_per_beat)
+      # a slower tempo every eighth note, then a note on every beat
+      tempos = [mido.MetaMessage("set_tempo", tempo=500000 + 100 * index,
+                                 time=0 if index == 0 else ticks_per_beat // 2)
+                for index in range(2000)]
+      notes = []
+      for beat in range(40):
+        notes.append(mido.Message("note_on", note=60, velocity=64, time=0))
+        notes.append(mido.Message("note_off", note=60, time=ticks_per_beat))
+      midi_file.tracks.append(mido.MidiTrack(tempos))
+      midi_file.tracks.append(mido.MidiTrack(notes))
+      midi_file.save(file_name)
+      notes_data, tempo_map, meter_map = ReadMidi.readMidi(file_name)
+      played = 0.0
+      press_times = []
+      for msg in mido.MidiFile(file_name):
+        played += msg.time
+        if (msg.type == "note_on"):
+          press_times.append(played)
+    starts = np.array([note[4] for note in notes_data])
+    np.testing.assert_allclose(tempo_map.seconds_at(starts), press_times,
+                               atol=1e-9)
+
+  def test_barlines_follow_time_signature_changes(self):
+    meter_map = TimeMap.MeterMap([0, 10, 16], [(4, 4), (3, 4), (4, 4)])
+    # the measure before the change to 3/4 is cut short at beat 10
+    self.assertEqual([meter_map.barline_beat(number) for number in range(1, 8)],
+                     [4, 8, 10, 13, 16, 20, 24])
+
+  def test_barlines_of_eighth_and_half_note_meters(self):
+    # measure lengths are in quarter notes: 6/8 is 3 beats long, 3/8 is 1.5 and 2/2 is 4
+    cases = [
+      ([0, 8], [(4, 4), (6, 8)], [4, 8, 11, 14]),
+      ([0, 6], [(3, 8), (2, 4)], [1.5, 3, 4.5, 6, 8, 10]),
+      ([0, 6, 14], [(4, 4), (2, 2), (12, 8)], [4, 6, 10, 14, 20]),
+      ([0, 5], [(5, 8), (3, 2)], [2.5, 5, 11]),
+    ]
+    for starts, signatures, expected in cases:
+      meter_map = TimeMap.MeterMap(starts, signatures)
+      beats = [
+        meter_map.barline_beat(number)
+        for number in range(1,
+                            len(expected) + 1)
+      ]
+      self.assertEqual(beats, expected, signatures)
+      # every measure is one beat of distance longer for its barline
+      self.assertEqual(
+        meter_map.barlines_through(np.array(expected)).tolist(),
+        list(range(1,
+                   len(expected) + 1)))
+
+  def test_time_signatures_of_a_midi_file(self):
+    with tempfile.TemporaryDirectory() as directory:
+      file_name = os.path.join(directory, "Meters.mid")
+      midi_file = mido.MidiFile(ticks_per_beat=480)
+      midi_file.tracks.append(
+        mido.MidiTrack([
+          mido.MetaMessage("time_signature", numerator=4, denominator=4),
+          mido.MetaMessage("time_signature",
+                           numerator=6,
+                           denominator=8,
+                           time=480 * 8),
+          mido.Message("note_on", note=60, velocity=64),
+          mido.Message("note_off", note=60, time=480 * 6)
+        ]))
+      midi_file.save(file_name)
+      song_data = ReadMidi.readMidi(file_name)
+    layout = main.SongLayout(["Meters.mid", [4, 4], 0, "0 sharps", 0],
+                             song_data)
+    self.assertEqual(
+      [layout.barlines.x(index) for index in range(1, 5)],
+      [get_x_values(layout, [beat])[0] - main.BEAT_DISTANCE
+       for beat in (4, 8, 11, 14)])
+
+  def test_single_time_signature_scrolls_at_the_old_speed(self):
+    for time_signature in ([4, 4], [3, 4], [6, 8], [2, 2]):
+      song = self.make_song(TimeMap.TempoMap([0], [90]),
+                            TimeMap.MeterMap([0], [(4, 4)]), time_signature)
+      beats_per_measure = time_signature[0]
+      self.assertAlmostEqual(
+        song.scroll_speed(), 90 / 60 * main.BEAT_DISTANCE *
+        (beats_per_measure + 1) / beats_per_measure)
+      song.clear()
+
+  def test_measures_start_on_time_across_time_signature_changes(self):
+    song = self.make_song(
+      TimeMap.TempoMap([0], [120]),
+      TimeMap.MeterMap([0, 10, 16], [(4, 4), (3, 4), (4, 4)]))
+    measure_starts = [0, 4, 8, 10, 13, 16, 20, 24]
+    times = arrival_times(song, measure_starts)
+    # the short measure from beat 8 to 10 takes 2 beats: 1 second at 120 bpm
+    np.testing.assert_allclose(times, np.array(measure_starts) * 0.5, atol=1e-3)
+    song.clear()
+
+  def test_measures_start_on_time_after_a_change_to_6_8(self):
+    song = self.make_song(TimeMap.TempoMap([0], [120]),
+                          TimeMap.MeterMap([0, 8], [(4, 4), (6, 8)]))
+    measure_starts = [0, 4, 8, 11, 14, 17]
+    np.testing.assert_allclose(arrival_times(song, measure_starts),
+                               np.array(measure_starts) * 0.5,
+                               atol=1e-3)
+    song.clear()
+
+  def test_measures_start_on_time_during_a_ritardando(self):
+    beats = np.arange(0, 30, 0.125)
+    tempo_map = TimeMap.TempoMap(beats, 120 - beats * 2)
+    song = self.make_song(
+      tempo_map, TimeMap.MeterMap([0, 10, 16], [(4, 4), (3, 4), (4, 4)]))
+    measure_starts = [0, 4, 8, 10, 13, 16, 20, 24]
+    np.testing.assert_allclose(arrival_times(song, measure_starts),
+                               tempo_map.seconds_at(
+                                 np.array(measure_starts, dtype=float)),
+                               atol=1e-3)
+    song.clear()
+
+
+if __name__ == "__main__":
+  unittest.main()